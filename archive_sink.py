@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+归档输出
+把匹配的文件直接以流的方式写入 tar 或 zip 归档（可选 gzip/bz2/xz/zstd 压缩），
+不在磁盘上创建中间文件。每个文件按固定大小的数据块读取和写入，内存占用与归档大小无关。
+zstd 压缩需要安装可选依赖 zstandard。
+"""
+import os
+import errno
+import tarfile
+import zipfile
+import threading
+
+try:
+    import zstandard
+except ImportError:  # 未安装时不支持 .tar.zst
+    zstandard = None
+
+# 写入归档时每次读取的字节数（也是进度回调的粒度）
+ARCHIVE_BUFFER_SIZE = 1024 * 1024
+
+# 归档文件后缀 -> (容器格式, 压缩方式)，按后缀长度从长到短匹配
+ARCHIVE_FORMATS = {
+    '.tar': ('tar', ''),
+    '.tar.gz': ('tar', 'gz'), '.tgz': ('tar', 'gz'),
+    '.tar.bz2': ('tar', 'bz2'), '.tbz2': ('tar', 'bz2'),
+    '.tar.xz': ('tar', 'xz'), '.txz': ('tar', 'xz'),
+    '.tar.zst': ('tar', 'zst'), '.tzst': ('tar', 'zst'),
+    '.zip': ('zip', 'deflate'),
+}
+
+class ArchiveBroken(OSError):
+    """归档在写入某个文件的过程中出错，已无法继续追加文件"""
+
+def archive_format(path):
+    """根据文件名后缀返回 (容器格式, 压缩方式)，不支持的后缀抛出 ValueError"""
+    name = os.path.basename(path).lower()
+    for suffix in sorted(ARCHIVE_FORMATS, key=len, reverse=True):
+        if name.endswith(suffix):
+            return ARCHIVE_FORMATS[suffix]
+    raise ValueError(f"不支持的归档格式: {path}（支持 {', '.join(ARCHIVE_FORMATS)}）")
+
+class _ProgressReader:
+    """包装源文件对象，每读取一个数据块调用一次进度回调"""
+
+    def __init__(self, f, progress):
+        self.f = f
+        self.progress = progress
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        if data and self.progress:
+            self.progress(len(data))
+        return data
+
+class ArchiveSink:
+    """以流的方式写入的 tar/zip 归档
+
+    add 可以从多个工作线程调用，写入按文件串行进行。源文件在写入前打开，
+    无法打开的文件不会影响归档；若在写入文件内容时出错（如读取失败或磁盘已满），
+    归档中已写入了不完整的成员，之后的 add 均抛出 ArchiveBroken。
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.container, self.compression = archive_format(path)
+        if self.compression == 'zst' and zstandard is None:
+            raise ValueError("写入 .tar.zst 需要安装 zstandard: pip install zstandard")
+        self._lock = threading.Lock()
+        self._broken = None
+        self._excluded = {os.path.normcase(self.path)}
+        self._raw = None
+        self._zstd = None
+        if self.container == 'zip':
+            self._archive = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        elif self.compression == 'zst':
+            self._raw = open(self.path, 'wb')
+            self._zstd = zstandard.ZstdCompressor().stream_writer(self._raw)
+            self._archive = tarfile.open(fileobj=self._zstd, mode='w|', format=tarfile.PAX_FORMAT)
+        else:
+            # 流模式（w|）逐块压缩写出，不会在内存中保留整个归档
+            self._archive = tarfile.open(self.path, f"w|{self.compression}", format=tarfile.PAX_FORMAT,
+                                         bufsize=ARCHIVE_BUFFER_SIZE)
+
+    def exclude(self, path):
+        """登记不应写入归档的文件（如与归档位于同一目录的作业日志）"""
+        self._excluded.add(os.path.normcase(os.path.abspath(path)))
+
+    def is_excluded(self, path):
+        """判断 path 是否为归档文件自身或已登记排除的文件（归档位于源目录中时用于跳过它们）"""
+        return os.path.normcase(os.path.abspath(path)) in self._excluded
+
+    def add(self, src, arcname, progress=None):
+        """把 src 的内容和元数据写入归档，成员名为 arcname（以 / 分隔），返回写入的字节数
+
+        progress 为可选回调，每写入一个数据块调用一次，参数为该块的字节数。
+        """
+        arcname = arcname.replace(os.sep, '/')
+        with open(src, 'rb') as f:
+            with self._lock:
+                if self._broken is not None:
+                    raise ArchiveBroken(errno.EIO, f"归档已损坏，无法继续写入: {self._broken}")
+                try:
+                    if self.container == 'zip':
+                        return self._add_zip(f, src, arcname, progress)
+                    return self._add_tar(f, arcname, progress)
+                except Exception as e:
+                    self._broken = e
+                    raise
+
+    def _add_tar(self, f, arcname, progress):
+        info = self._archive.gettarinfo(arcname=arcname, fileobj=f)
+        self._archive.addfile(info, _ProgressReader(f, progress))
+        return info.size
+
+    def _add_zip(self, f, src, arcname, progress):
+        info = zipfile.ZipInfo.from_file(src, arcname)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        size = os.fstat(f.fileno()).st_size
+        written = 0
+        with self._archive.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as dst:
+            while True:
+                data = f.read(ARCHIVE_BUFFER_SIZE)
+                if not data:
+                    break
+                dst.write(data)
+                written += len(data)
+                if progress:
+                    progress(len(data))
+        return written
+
+    def close(self):
+        """写完归档尾部并关闭文件"""
+        try:
+            self._archive.close()
+            if self._zstd is not None:
+                self._zstd.close()
+        finally:
+            if self._raw is not None and not self._raw.closed:
+                self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+asyncio 接口
+在事件循环中扫描和复制文件：阻塞的文件操作交给线程池执行，处理过程以事件的形式
+通过异步迭代器逐个产出，不再需要解析控制台输出。多个作业可以在同一个事件循环中
+共享一个线程池运行，每个作业同时处理的文件数由 concurrency 限制。
+
+    async for event in copy_files(src, dst, ['pdf'], concurrency=8):
+        if isinstance(event, BytesCopied):
+            ...
+"""
+import os
+import time
+import asyncio
+import itertools
+from collections import namedtuple
+
+from file_copier import DestNameTable, JobContext, transfer_file, iter_files
+from file_filter import FileFilter
+
+# 扫描时每次在线程池中取出的文件数，避免每个文件都切换一次线程
+SCAN_BATCH_SIZE = 256
+
+# 默认同时处理的文件数
+DEFAULT_CONCURRENCY = 4
+
+# 扫描到一个匹配的文件
+Discovered = namedtuple('Discovered', ['path', 'size'])
+# 开始处理一个文件
+Started = namedtuple('Started', ['path', 'dest'])
+# 复制了一个数据块；某种复制方式中途回退时 bytes 为负数，撤销已报告的字节
+BytesCopied = namedtuple('BytesCopied', ['path', 'bytes'])
+# 文件处理完成：skipped 表示目标未变化而跳过（仅 sync），digest 为校验摘要（仅 verify）
+Finished = namedtuple('Finished', ['path', 'dest', 'bytes', 'duration', 'skipped', 'digest'])
+# 文件处理失败，error 为异常对象
+Failed = namedtuple('Failed', ['path', 'error'])
+
+async def scan_files(source_dir, name_filter=None, skip_dirs=None, dir_filter=None, executor=None):
+    """异步遍历源目录，逐个产出 SourceFile
+
+    目录枚举在 executor（默认为事件循环的默认线程池）中按批执行，参数含义与 iter_files 相同。
+    """
+    loop = asyncio.get_running_loop()
+    files = iter_files(source_dir, name_filter, skip_dirs, dir_filter)
+    while True:
+        batch = await loop.run_in_executor(executor, list, itertools.islice(files, SCAN_BATCH_SIZE))
+        if not batch:
+            return
+        for source_file in batch:
+            yield source_file
+
+async def copy_files(source_dir, dest_dir, extensions=None, include_keywords=None, exclude_keywords=None,
+                     is_move=False, keep_structure=False, concurrency=DEFAULT_CONCURRENCY, copy_method='auto',
+                     sync=False, verify=False, file_filter=None, dir_filter=None, on_collision='suffix',
+                     parallel=None, executor=None):
+    """异步复制或移动文件，以异步迭代器的形式产出 Discovered、Started、BytesCopied、Finished 和 Failed 事件
+
+    筛选、保留结构、复制方式、增量同步、校验和大文件分块复制的参数含义与 process_files 相同。
+    concurrency 为本作业同时处理的文件数；文件操作在 executor（默认为事件循环的默认线程池）中执行，
+    多个作业可以共享同一个 executor。扫描随处理进度推进，内存占用与文件总数无关，
+    因此平铺模式只支持逐个分配名称的 suffix 和 parent 两种同名处理方式。
+    提前停止迭代时不再提交新的文件，已在线程池中执行的文件操作会继续完成。
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency 必须大于等于 1")
+    names = None if keep_structure else DestNameTable(on_collision)
+    if names is not None and not names.streaming:
+        raise ValueError(f"copy_files 不支持需要等待扫描结束的同名处理方式: {on_collision}")
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, lambda: os.makedirs(dest_dir, exist_ok=True))
+    ctx = JobContext(source_dir, dest_dir, is_move, keep_structure, copy_method, sync,
+                     names=names, parallel=parallel, verify=verify)
+    name_filter = file_filter or FileFilter(extensions, include_keywords, exclude_keywords)
+
+    events = asyncio.Queue()
+    slots = asyncio.Semaphore(concurrency)
+
+    def process(source_file):
+        """在线程池中执行：处理单个文件，数据块进度通过事件循环转发"""
+        def progress(num_bytes):
+            loop.call_soon_threadsafe(events.put_nowait, BytesCopied(source_file.path, num_bytes))
+        start = time.monotonic()
+        result = transfer_file(source_file, ctx, progress)
+        return result, time.monotonic() - start
+
+    async def run_one(source_file):
+        try:
+            dest_path = ctx.dest_path(source_file)
+            events.put_nowait(Started(source_file.path, dest_path))
+            result, duration = await loop.run_in_executor(executor, process, source_file)
+            events.put_nowait(Finished(source_file.path, result['dest'], result['bytes'], duration,
+                                       result['skipped'], result.get('digest')))
+        except Exception as e:
+            events.put_nowait(Failed(source_file.path, e))
+        finally:
+            slots.release()
+
+    async def produce():
+        tasks = set()
+        try:
+            # 目标目录位于源目录内部时不扫描它
+            async for source_file in scan_files(source_dir, name_filter, [dest_dir], dir_filter, executor):
+                if names is not None:
+                    names.assign(source_file)
+                events.put_nowait(Discovered(source_file.path, source_file.size))
+                await slots.acquire()
+                task = asyncio.ensure_future(run_one(source_file))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            # 扫描出错或被取消时同样等待已提交的文件处理完，作业结束后不再有文件操作在进行
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            events.put_nowait(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        # 扫描中的异常在这里抛出
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
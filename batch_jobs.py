@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+批量作业
+作业文件（JSON 或 TOML）列出多组源目录和目标目录，每组有自己的筛选规则、移动/保留结构和日志设置。
+所有任务在同一个进程中调度执行：各任务的线程数之和不超过全局预算，写入同一目标目录的任务依次执行，
+结束后输出每个任务的结果和合并的汇总。读取 TOML 需要 Python 3.11 以上或安装 tomli。
+
+JSON 作业文件示例（TOML 中使用相同的键，任务写作 [[tasks]]）：
+
+    {
+      "workers": 16,
+      "defaults": {"keep": true, "exclude_dir": [".git"]},
+      "tasks": [
+        {"name": "合同", "source": "D:/共享/合同", "destination": "E:/备份/合同", "extensions": ["pdf", "docx"]},
+        {"source": "D:/相机", "destination": "E:/照片", "extensions": ["jpg"], "move": true, "workers": 4}
+      ]
+    }
+"""
+import os
+import sys
+import re
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10 及以下
+    try:
+        import tomli as tomllib
+    except ImportError:  # 未安装时只支持 JSON 作业文件
+        tomllib = None
+
+import copy_backend
+from file_copier import process_files, COLLISION_MODES, LOG_FORMATS
+from file_filter import FileFilter, DirFilter
+from progress import format_size
+from scan_index import ScanIndex
+
+# 作业文件未指定且命令行未指定 -w 时的全局线程数
+DEFAULT_BATCH_WORKERS = 8
+
+# 任务字段及其类型；元组表示取值只能是其中之一
+TASK_FIELDS = {
+    'name': str,
+    'source': str,
+    'destination': str,
+    'extensions': list,
+    'include': list,
+    'exclude': list,
+    'glob': list,
+    'regex': list,
+    'exclude_dir': list,
+    'max_depth': int,
+    'move': bool,
+    'keep': bool,
+    'log': bool,
+    'sync': bool,
+    'verify': bool,
+    'workers': int,
+    'on_collision': COLLISION_MODES,
+    'copy_method': copy_backend.COPY_METHODS,
+    'log_format': LOG_FORMATS,
+}
+
+# 作业文件顶层的键
+JOB_FILE_KEYS = ('workers', 'defaults', 'tasks')
+
+# 一个任务：筛选规则已编译，路径已转换为绝对路径；workers 为该任务占用的线程数
+BatchTask = namedtuple('BatchTask', ['name', 'source', 'destination', 'file_filter', 'dir_filter', 'is_move',
+                                     'keep_structure', 'log_enabled', 'workers', 'on_collision', 'sync',
+                                     'verify', 'copy_method', 'log_format'])
+
+# 一个任务的执行结果：summary 为 process_files 的返回值（没有匹配的文件时为 None），
+# error 为使任务无法完成的异常（单个文件的失败计入 summary['errors']）
+TaskResult = namedtuple('TaskResult', ['task', 'summary', 'error'])
+
+def _check_field(key, value, where):
+    """检查任务字段的类型和取值，不正确时抛出 ValueError"""
+    kind = TASK_FIELDS.get(key)
+    if kind is None:
+        raise ValueError(f"{where}: 未知的字段 {key}（支持 {', '.join(TASK_FIELDS)}）")
+    if isinstance(kind, tuple):
+        if value not in kind:
+            raise ValueError(f"{where}: {key} 只能是 {', '.join(kind)} 之一")
+    elif kind is list:
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{where}: {key} 必须是字符串或字符串列表")
+    elif kind is int:
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"{where}: {key} 必须是整数")
+    elif not isinstance(value, kind):
+        raise ValueError(f"{where}: {key} 必须是{'布尔值' if kind is bool else '字符串'}")
+
+def _normalize_fields(fields, where):
+    """检查一组字段，返回副本；列表字段可以只写一个字符串"""
+    if not isinstance(fields, dict):
+        raise ValueError(f"{where}: 必须是键值表")
+    fields = {key: [value] if TASK_FIELDS.get(key) is list and isinstance(value, str) else value
+              for key, value in fields.items()}
+    for key, value in fields.items():
+        _check_field(key, value, where)
+    if fields.get('workers', 1) < 1:
+        raise ValueError(f"{where}: workers 必须大于等于 1")
+    if fields.get('max_depth', 0) < 0:
+        raise ValueError(f"{where}: max_depth 不能小于 0")
+    return fields
+
+def _build_task(fields, base_dir, where):
+    """由合并后的字段生成 BatchTask；相对路径相对于作业文件所在目录"""
+    for key in ('source', 'destination'):
+        if not fields.get(key):
+            raise ValueError(f"{where}: 缺少 {key}")
+    source = os.path.join(base_dir, os.path.expanduser(fields['source']))
+    destination = os.path.join(base_dir, os.path.expanduser(fields['destination']))
+    try:
+        file_filter = FileFilter(fields.get('extensions'), fields.get('include'), fields.get('exclude'),
+                                 fields.get('glob'), fields.get('regex'))
+    except re.error as e:
+        raise ValueError(f"{where}: 无效的正则表达式: {e}") from e
+    dir_filter = None
+    if fields.get('exclude_dir') or fields.get('max_depth') is not None:
+        dir_filter = DirFilter(fields.get('exclude_dir'), fields.get('max_depth'))
+    name = fields.get('name') or os.path.basename(os.path.normpath(source))
+    return BatchTask(name, source, destination, file_filter, dir_filter, fields.get('move', False),
+                     fields.get('keep', False), fields.get('log', True), fields.get('workers', 1),
+                     fields.get('on_collision', 'suffix'), fields.get('sync', False), fields.get('verify', False),
+                     fields.get('copy_method', 'auto'), fields.get('log_format', 'text'))
+
+def load_job_file(path, defaults=None):
+    """读取作业文件，返回 (任务列表, 全局线程数)，文件中未指定线程数时后者为 None
+
+    后缀为 .toml 时按 TOML 读取，否则按 JSON 读取。字段的优先级为：任务中的字段、
+    文件中的 defaults、参数 defaults（命令行选项）。格式不正确时抛出 ValueError。
+    """
+    try:
+        if path.lower().endswith('.toml'):
+            if tomllib is None:
+                raise ValueError("读取 TOML 作业文件需要 Python 3.11 以上或安装 tomli")
+            with open(path, 'rb') as f:
+                data = tomllib.load(f)
+        else:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+    except ValueError as e:
+        # JSONDecodeError 和 TOMLDecodeError 都是 ValueError
+        raise ValueError(f"无法解析作业文件 {path}: {e}") from e
+
+    if not isinstance(data, dict):
+        raise ValueError(f"作业文件 {path} 的顶层必须是键值表")
+    unknown = set(data) - set(JOB_FILE_KEYS)
+    if unknown:
+        raise ValueError(f"作业文件中有未知的键: {', '.join(sorted(unknown))}（支持 {', '.join(JOB_FILE_KEYS)}）")
+    workers = data.get('workers')
+    if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool) or workers < 1):
+        raise ValueError("作业文件中的 workers 必须是大于等于 1 的整数")
+    tasks = data.get('tasks')
+    if not isinstance(tasks, list) or not tasks:
+        raise ValueError(f"作业文件 {path} 中没有任务（tasks）")
+
+    base = _normalize_fields(defaults or {}, "默认选项")
+    base.update(_normalize_fields(data.get('defaults', {}), "defaults"))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    result = []
+    for index, fields in enumerate(tasks, 1):
+        where = f"第 {index} 个任务"
+        merged = dict(base)
+        merged.update(_normalize_fields(fields, where))
+        result.append(_build_task(merged, base_dir, where))
+    return result, workers
+
+def _dest_key(task):
+    return os.path.normcase(os.path.abspath(task.destination))
+
+def _run_task(task, workers, quiet, parallel, index_path, control):
+    """在调度线程中执行一个任务，返回 process_files 的汇总"""
+    if not os.path.isdir(task.source):
+        raise FileNotFoundError(f"源目录 '{task.source}' 不存在")
+    # 每个任务各自打开扫描索引（同一个 ScanIndex 同一时间只能被一个扫描使用）
+    scan_index = ScanIndex(index_path) if index_path else None
+    try:
+        return process_files(task.source, task.destination, None, None, None, task.is_move,
+                             task.keep_structure, task.log_enabled, workers=workers,
+                             copy_method=task.copy_method, sync=task.sync, file_filter=task.file_filter,
+                             dir_filter=task.dir_filter, show_progress=False, quiet=quiet,
+                             log_format=task.log_format, scan_index=scan_index,
+                             on_collision=task.on_collision, parallel=parallel, verify=task.verify,
+                             control=control, show_summary=False)
+    finally:
+        if scan_index is not None:
+            scan_index.close()
+
+def _print_task_result(result, finished, total):
+    """任务结束时输出一行结果"""
+    task, summary, error = result
+    prefix = f"[{finished}/{total}] {task.name}"
+    if error is not None:
+        print(f"{prefix}: 失败: {error}", file=sys.stderr)
+    elif summary is None:
+        print(f"{prefix}: 没有找到匹配的文件")
+    else:
+        op_type = "移动" if task.is_move else "复制"
+        state = "已取消" if summary['cancelled'] else "完成"
+        print(f"{prefix}: {state}, {op_type} {summary['files']} 个文件, {format_size(summary['bytes'])}, "
+              f"失败 {summary['errors']} 个, 耗时 {summary['elapsed']:.2f} 秒")
+
+def run_batch(tasks, workers=DEFAULT_BATCH_WORKERS, quiet=False, parallel=None, index_path=None, control=None):
+    """在当前进程中并发执行一组 BatchTask，返回合并的汇总字典
+
+    workers 为全局线程预算：按作业文件中的顺序启动任务，正在执行的任务的线程数之和不超过 workers
+    （单个任务的线程数超过预算时按预算执行）；排在前面的任务等待线程时，后面的任务也不会抢先启动。
+    目标目录相同的任务依次执行，不会同时写入同一目录（同名处理和同步日志互不干扰）。
+    quiet、parallel 和 control 对所有任务生效，含义与 process_files 相同；取消后不再启动新的任务。
+    index_path 为扫描索引数据库路径，指定时每个任务各自打开该数据库扫描源目录。
+    单个任务出错（如源目录不存在）不影响其他任务，记录在汇总的 results 中。
+    """
+    if workers < 1:
+        raise ValueError("workers 必须大于等于 1")
+    start_time = time.monotonic()
+    results = [None] * len(tasks)
+    pending = list(range(len(tasks)))
+    running = {}
+    free = workers
+    busy_dests = set()
+    finished = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(tasks), workers)),
+                            thread_name_prefix='BatchTask') as pool:
+        while pending or running:
+            if control is not None and control.cancelled:
+                pending = []
+            for index in list(pending):
+                task = tasks[index]
+                need = min(task.workers, workers)
+                if need > free:
+                    break
+                key = _dest_key(task)
+                if key in busy_dests:
+                    continue
+                pending.remove(index)
+                free -= need
+                busy_dests.add(key)
+                future = pool.submit(_run_task, task, need, quiet, parallel, index_path, control)
+                running[future] = (index, need, key)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, need, key = running.pop(future)
+                free += need
+                busy_dests.discard(key)
+                try:
+                    result = TaskResult(tasks[index], future.result(), None)
+                except Exception as e:
+                    result = TaskResult(tasks[index], None, e)
+                results[index] = result
+                finished += 1
+                _print_task_result(result, finished, len(tasks))
+
+    elapsed = max(time.monotonic() - start_time, 1e-9)
+    summary = {'tasks': len(tasks), 'completed': 0, 'failed': 0, 'not_started': 0,
+               'files': 0, 'bytes': 0, 'errors': 0, 'skipped': 0, 'collisions': 0, 'verified': 0}
+    for result in results:
+        if result is None:
+            summary['not_started'] += 1
+        elif result.error is not None:
+            summary['failed'] += 1
+        else:
+            summary['completed'] += 1
+            if result.summary is not None:
+                for key in ('files', 'bytes', 'errors', 'skipped', 'collisions', 'verified'):
+                    summary[key] += result.summary.get(key, 0)
+    summary['cancelled'] = control is not None and control.cancelled
+    summary['elapsed'] = elapsed
+    summary['files_per_sec'] = summary['files'] / elapsed
+    summary['bytes_per_sec'] = summary['bytes'] / elapsed
+    summary['results'] = results
+    return summary
+
+def print_batch_summary(summary):
+    """打印批量作业的合并汇总"""
+    if summary['cancelled']:
+        print("\n作业已取消：未开始的任务不再执行，正在执行的任务保留取消前完成的文件。"
+              "使用 sync 重新运行可跳过已完成的文件")
+    print(f"\n批量作业: {summary['tasks']} 个任务, 完成 {summary['completed']} 个, "
+          f"失败 {summary['failed']} 个, 未开始 {summary['not_started']} 个")
+    print(f"合计: {summary['files']} 个文件, {format_size(summary['bytes'])}, "
+          f"失败 {summary['errors']} 个, 耗时 {summary['elapsed']:.2f} 秒")
+    if summary['skipped']:
+        print(f"已跳过未变化的文件: {summary['skipped']} 个")
+    if summary['collisions']:
+        print(f"同名文件: {summary['collisions']} 个（已改名或未处理，详见各任务的日志）")
+    if summary['verified']:
+        print(f"已校验: {summary['verified']} 个文件")
+    print(f"平均速度: {summary['files_per_sec']:.1f} 文件/秒, {format_size(summary['bytes_per_sec'])}/秒")
+    failed = [result for result in summary['results'] if result is not None and result.error is not None]
+    if failed:
+        print("失败的任务:")
+        for result in failed:
+            print(f"  {result.task.name}: {result.error}")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+性能基准测试
+在临时目录中按固定随机种子生成可复现的合成目录树，分别测量扫描、筛选、类型分析、
+复制和移动各阶段的耗时、文件数/秒、MB/秒以及各阶段使进程峰值内存增加的量，结果以 JSON 输出，
+并可与之前保存的基线结果比较，发现性能退化。
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+from file_copier import get_all_files, should_process_file, collect_file_types, process_files
+from file_filter import FileFilter
+import copy_backend
+
+# 各场景的基本规模（--scale 按比例缩放文件数量，大文件场景缩放文件大小）
+SCENARIOS = {
+    # 大量小文件：每个目录 100 个 0~4KB 的文件
+    'tiny': {'files': 10000, 'per_dir': 100, 'max_size': 4096},
+    # 少量大文件
+    'huge': {'files': 4, 'size': 32 * 1024 * 1024},
+    # 深层嵌套：每层 10 个文件
+    'deep': {'depth': 64, 'per_level': 10, 'max_size': 4096},
+    # 单个目录中的大量文件
+    'wide': {'files': 10000, 'max_size': 1024},
+    # 大量同名文件：每个目录中的文件名都相同
+    'collisions': {'dirs': 100, 'names': 50, 'max_size': 2048},
+}
+
+# 测量的阶段
+PHASES = ('scan', 'filter', 'analyze', 'copy', 'move')
+
+# 筛选阶段使用的规则
+FILTER_EXTENSIONS = ['.txt', '.log', '.dat']
+FILTER_INCLUDE = ['file', 'data']
+FILTER_EXCLUDE = ['tmp', 'bak']
+
+# 合成文件使用的扩展名
+SYNTHETIC_EXTENSIONS = ('.txt', '.log', '.dat', '.jpg', '.bin', '')
+
+# 比较基线时默认允许的退化比例
+DEFAULT_THRESHOLD = 0.10
+
+def _write_file(path, size, rng):
+    with open(path, 'wb') as f:
+        f.write(rng.randbytes(size))
+
+def _write_large_file(path, size, rng):
+    """写入大文件：重复写入同一块随机数据，避免生成随机数成为瓶颈"""
+    block = rng.randbytes(1024 * 1024)
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = block[:min(len(block), remaining)]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+def _random_name(rng, index):
+    prefix = rng.choice(('file', 'data', 'img', 'tmp', 'report', 'bak'))
+    return f"{prefix}_{index:06d}{rng.choice(SYNTHETIC_EXTENSIONS)}"
+
+def generate_tree(root, scenario, scale=1.0, seed=0):
+    """在 root 下生成指定场景的合成目录树，返回 (文件数, 总字节数)
+
+    相同的场景、规模和随机种子总是生成相同的目录结构和文件内容。
+    """
+    spec = SCENARIOS[scenario]
+    rng = random.Random(f"{scenario}-{seed}")
+    os.makedirs(root, exist_ok=True)
+    files = 0
+    total = 0
+
+    if scenario == 'tiny':
+        count = max(int(spec['files'] * scale), 1)
+        for index in range(count):
+            directory = os.path.join(root, f"dir_{index // spec['per_dir']:04d}")
+            os.makedirs(directory, exist_ok=True)
+            size = rng.randint(0, spec['max_size'])
+            _write_file(os.path.join(directory, _random_name(rng, index)), size, rng)
+            files += 1
+            total += size
+    elif scenario == 'huge':
+        size = max(int(spec['size'] * scale), 1)
+        for index in range(spec['files']):
+            _write_large_file(os.path.join(root, f"data_{index:02d}.bin"), size, rng)
+            files += 1
+            total += size
+    elif scenario == 'deep':
+        directory = root
+        depth = max(int(spec['depth'] * scale), 1)
+        for level in range(depth):
+            directory = os.path.join(directory, f"level_{level:03d}")
+            os.makedirs(directory, exist_ok=True)
+            for index in range(spec['per_level']):
+                size = rng.randint(0, spec['max_size'])
+                _write_file(os.path.join(directory, _random_name(rng, level * spec['per_level'] + index)), size, rng)
+                files += 1
+                total += size
+    elif scenario == 'wide':
+        count = max(int(spec['files'] * scale), 1)
+        for index in range(count):
+            size = rng.randint(0, spec['max_size'])
+            _write_file(os.path.join(root, _random_name(rng, index)), size, rng)
+            files += 1
+            total += size
+    elif scenario == 'collisions':
+        names = [f"file_{index:03d}.txt" for index in range(spec['names'])]
+        for dir_index in range(max(int(spec['dirs'] * scale), 1)):
+            directory = os.path.join(root, f"folder_{dir_index:04d}")
+            os.makedirs(directory, exist_ok=True)
+            for name in names:
+                size = rng.randint(0, spec['max_size'])
+                _write_file(os.path.join(directory, name), size, rng)
+                files += 1
+                total += size
+    else:
+        raise ValueError(f"未知的场景: {scenario}")
+    return files, total
+
+def peak_rss():
+    """返回进程的峰值常驻内存（字节）；平台不支持时返回 None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def _measure(func, files, num_bytes, repeat=1, setup=None):
+    """执行 func 若干次并取最快的一次，返回该阶段的测量结果
+
+    ru_maxrss 是整个进程生命周期内只增不减的峰值，无法单独反映某个阶段，因此 peak_rss_growth
+    记录的是该阶段使进程峰值增加的字节数：为 0 表示该阶段的内存占用没有超过之前的峰值
+    （进程整体的峰值见报告顶层的 peak_rss）。
+    """
+    rss_before = peak_rss()
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    elapsed = max(best, 1e-9)
+    return {
+        'seconds': round(elapsed, 6),
+        'files': files,
+        'bytes': num_bytes,
+        'files_per_sec': round(files / elapsed, 1),
+        'mb_per_sec': round(num_bytes / elapsed / (1024 * 1024), 2),
+        'peak_rss_growth': None if rss_before is None else peak_rss() - rss_before,
+    }
+
+def run_scenario(work_dir, scenario, scale=1.0, seed=0, phases=PHASES, repeat=1, workers=1, copy_method='auto'):
+    """生成一个场景的目录树并测量各阶段，返回 {阶段: 测量结果}"""
+    source = os.path.join(work_dir, scenario, 'source')
+    files, total = generate_tree(source, scenario, scale, seed)
+    names = [os.path.basename(path) for path in get_all_files(source)]
+    results = {'files': files, 'bytes': total}
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+
+    def run_quietly(func):
+        def wrapper():
+            with contextlib.redirect_stdout(devnull):
+                func()
+        return wrapper
+
+    try:
+        if 'scan' in phases:
+            results['scan'] = _measure(lambda: get_all_files(source), files, 0, repeat)
+        if 'filter' in phases:
+            def filter_names():
+                file_filter = FileFilter(FILTER_EXTENSIONS, FILTER_INCLUDE, FILTER_EXCLUDE)
+                for name in names:
+                    file_filter.match(name)
+            results['filter'] = _measure(filter_names, len(names), 0, repeat)
+
+            def filter_names_compat():
+                for name in names:
+                    should_process_file(name, FILTER_INCLUDE, FILTER_EXCLUDE, FILTER_EXTENSIONS)
+            results['filter_compat'] = _measure(filter_names_compat, len(names), 0, repeat)
+        if 'analyze' in phases:
+            results['analyze'] = _measure(lambda: collect_file_types(source, workers=max(workers, 1)),
+                                          files, 0, repeat)
+
+        dest = os.path.join(work_dir, scenario, 'dest')
+        # 同名文件场景以平铺方式复制，测量名称冲突处理的开销
+        keep_structure = scenario != 'collisions'
+        if 'copy' in phases:
+            results['copy'] = _measure(
+                run_quietly(lambda: process_files(source, dest, None, None, None, keep_structure=keep_structure,
+                                                  log_enabled=False, workers=workers, copy_method=copy_method,
+                                                  show_progress=False, quiet=True)),
+                files, total, repeat, setup=lambda: shutil.rmtree(dest, ignore_errors=True))
+        if 'move' in phases:
+            # 每次移动前从源目录复制一份待移动的目录树（不计入耗时）
+            move_source = os.path.join(work_dir, scenario, 'move_source')
+
+            def prepare_move():
+                shutil.rmtree(move_source, ignore_errors=True)
+                shutil.rmtree(dest, ignore_errors=True)
+                shutil.copytree(source, move_source)
+            results['move'] = _measure(
+                run_quietly(lambda: process_files(move_source, dest, None, None, None, is_move=True,
+                                                  keep_structure=True, log_enabled=False, workers=workers,
+                                                  copy_method=copy_method, show_progress=False, quiet=True)),
+                files, total, repeat, setup=prepare_move)
+    finally:
+        devnull.close()
+        shutil.rmtree(os.path.join(work_dir, scenario), ignore_errors=True)
+    return results
+
+def run_benchmarks(scenarios=None, scale=1.0, seed=0, phases=PHASES, repeat=1, workers=1, copy_method='auto', work_dir=None):
+    """运行全部（或指定的）场景，返回 JSON 可序列化的报告字典"""
+    scenarios = scenarios or list(SCENARIOS)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'scale': scale,
+        'seed': seed,
+        'workers': workers,
+        'copy_method': copy_method,
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='file_copier_bench_', dir=work_dir) as tmp:
+        for scenario in scenarios:
+            print(f"正在运行场景: {scenario}", file=sys.stderr)
+            report['scenarios'][scenario] = run_scenario(tmp, scenario, scale, seed, phases, repeat,
+                                                         workers, copy_method)
+    report['peak_rss'] = peak_rss()
+    return report
+
+def compare_reports(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """与基线报告比较各阶段耗时，返回 [(场景, 阶段, 基线耗时, 当前耗时, 变化比例, 是否退化), ...]"""
+    rows = []
+    for scenario, phases in report['scenarios'].items():
+        base_phases = baseline.get('scenarios', {}).get(scenario)
+        if not base_phases:
+            continue
+        for phase, result in phases.items():
+            base = base_phases.get(phase)
+            if not isinstance(result, dict) or not isinstance(base, dict):
+                continue
+            change = (result['seconds'] - base['seconds']) / max(base['seconds'], 1e-9)
+            rows.append((scenario, phase, base['seconds'], result['seconds'], change, change > threshold))
+    return rows
+
+def print_comparison(rows, threshold=DEFAULT_THRESHOLD):
+    """打印与基线的比较结果"""
+    print(f"\n与基线比较（耗时增加超过 {threshold:.0%} 视为退化）：", file=sys.stderr)
+    print("-" * 72, file=sys.stderr)
+    print(f"{'场景':<12} {'阶段':<14} {'基线(秒)':<12} {'当前(秒)':<12} {'变化':<10}", file=sys.stderr)
+    print("-" * 72, file=sys.stderr)
+    for scenario, phase, base, current, change, regressed in rows:
+        mark = "  <-- 退化" if regressed else ""
+        print(f"{scenario:<12} {phase:<14} {base:<12.4f} {current:<12.4f} {change:+.1%}{mark}", file=sys.stderr)
+    print("-" * 72, file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='文件复制工具性能基准测试')
+    parser.add_argument('-s', '--scenario', nargs='+', choices=list(SCENARIOS), help='要运行的场景（默认全部）')
+    parser.add_argument('-p', '--phase', nargs='+', choices=PHASES, help='要测量的阶段（默认全部）')
+    parser.add_argument('--scale', type=float, default=1.0, help='目录树规模的缩放比例（默认 1.0）')
+    parser.add_argument('--seed', type=int, default=0, help='生成目录树的随机种子（默认 0）')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='每个阶段重复次数，取最快的一次（默认 1）')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='复制/移动/分析使用的线程数（默认 1）')
+    parser.add_argument('--copy-method', choices=copy_backend.COPY_METHODS, default='auto', help='复制方式（默认 auto）')
+    parser.add_argument('--work-dir', help='生成临时目录树的位置（默认系统临时目录）')
+    parser.add_argument('-o', '--output', help='把 JSON 报告写入文件（默认输出到标准输出）')
+    parser.add_argument('--baseline', help='与之前保存的基线报告比较，出现退化时以状态码 1 退出')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'视为退化的耗时增加比例（默认 {DEFAULT_THRESHOLD}）')
+    args = parser.parse_args()
+
+    if args.scale <= 0 or args.repeat < 1 or args.workers < 1:
+        print("错误：--scale 必须大于 0，--repeat 和 --workers 必须大于等于 1", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"错误：无法读取基线报告: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    report = run_benchmarks(args.scenario, args.scale, args.seed, tuple(args.phase or PHASES), args.repeat,
+                            args.workers, args.copy_method, args.work_dir)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基准测试报告已保存到: {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if baseline is not None:
+        rows = compare_reports(report, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[5] for row in rows):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
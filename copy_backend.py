@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+文件复制后端
+按 reflink 克隆 -> copy_file_range -> sendfile -> 用户态读写 的顺序尝试，
+不支持时自动回退，复制完成后与 shutil.copy2 一样复制文件元数据。
+超过指定大小的文件可以预分配目标空间后，由多个线程用 pread/pwrite 并行复制不同的数据块。
+校验复制（copy2_verified）在同一次读取中计算源数据的摘要，写完后绕过页缓存读回目标文件比较。
+"""
+import os
+import errno
+import shutil
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows 等平台没有 fcntl
+    fcntl = None
+
+# 可选的复制方式
+COPY_METHODS = ('auto', 'reflink', 'kernel', 'userspace')
+
+# Linux ioctl FICLONE，用于 btrfs/XFS 等写时复制文件系统的克隆
+FICLONE = 0x40049409
+
+# 用户态复制缓冲区大小
+USERSPACE_BUFFER_SIZE = 1024 * 1024
+
+# 内核复制每次调用的最大字节数（也是进度回调的粒度）
+KERNEL_CHUNK_SIZE = 16 * 1024 * 1024
+
+# 这些错误码表示当前文件系统或内核不支持该复制方式，可以回退到下一种
+_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.ENOTTY,
+    errno.EOPNOTSUPP, errno.ENOTSUP, errno.ETXTBSY, errno.EPERM,
+}
+
+# 其中确实表示“不支持该操作”的错误码：记住对应的设备组合，之后的文件不再尝试该方式；
+# 其余错误码（如 EPERM、EBADF）只让当前文件回退
+_UNSUPPORTED_ERRNOS = {errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EXDEV, errno.EINVAL}
+
+# 大文件并行复制的参数：threshold 为启用的最小文件大小，chunk_size 为每个线程负责的数据块大小，
+# workers 为单个文件的复制线程数
+ParallelCopy = namedtuple('ParallelCopy', ['threshold', 'chunk_size', 'workers'])
+
+DEFAULT_PARALLEL_THRESHOLD = 1024 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+DEFAULT_CHUNK_WORKERS = 4
+
+# 并行复制时每次 pread/pwrite 的最大字节数（也是进度回调的粒度）
+PARALLEL_BUFFER_SIZE = 8 * 1024 * 1024
+
+# 校验读回目标文件时每次读取的字节数
+VERIFY_BUFFER_SIZE = 4 * 1024 * 1024
+
+# 已确认不支持的 (复制方式, 源设备, 目标设备) 组合，避免对每个文件重复尝试
+_unsupported = set()
+_unsupported_lock = threading.Lock()
+
+class CopyMethodUnsupported(OSError):
+    """指定的复制方式在当前平台或文件系统上不可用"""
+
+class VerifyFailed(OSError):
+    """读回的目标文件摘要与复制时计算的源数据摘要不一致"""
+
+class _IncompleteCopy(OSError):
+    """内核复制在读到预期的字节数之前就返回 0（部分文件系统不支持时会这样），回退到下一种方式"""
+
+def _reflink(src_fd, dst_fd, size, progress):
+    """通过 FICLONE 克隆整个文件（仅共享数据块，不复制数据）"""
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "当前平台不支持 reflink")
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    if progress:
+        progress(size)
+
+def _copy_file_range(src_fd, dst_fd, size, progress):
+    """使用 os.copy_file_range 在内核中复制数据"""
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, "当前平台不支持 copy_file_range")
+    total = 0
+    while True:
+        copied = os.copy_file_range(src_fd, dst_fd, KERNEL_CHUNK_SIZE)
+        if copied == 0:
+            break
+        total += copied
+        if progress:
+            progress(copied)
+    if total < size:
+        raise _IncompleteCopy(errno.EIO, f"copy_file_range 只复制了 {total} / {size} 字节")
+
+def _sendfile(src_fd, dst_fd, size, progress):
+    """使用 os.sendfile 在内核中复制数据"""
+    if not hasattr(os, 'sendfile'):
+        raise OSError(errno.ENOSYS, "当前平台不支持 sendfile")
+    offset = 0
+    while True:
+        sent = os.sendfile(dst_fd, src_fd, offset, KERNEL_CHUNK_SIZE)
+        if sent == 0:
+            break
+        offset += sent
+        if progress:
+            progress(sent)
+    if offset < size:
+        raise _IncompleteCopy(errno.EIO, f"sendfile 只复制了 {offset} / {size} 字节")
+
+def _userspace(src_fd, dst_fd, size, progress, hasher=None):
+    """在用户态中分块读写复制数据；指定 hasher 时同时用读到的数据更新摘要"""
+    while True:
+        data = os.read(src_fd, USERSPACE_BUFFER_SIZE)
+        if not data:
+            break
+        if hasher is not None:
+            hasher.update(data)
+        view = memoryview(data)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
+        if progress:
+            progress(len(data))
+
+def _preallocate(dst_fd, size):
+    """为目标文件预分配空间，文件系统不支持时只设置文件长度"""
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(dst_fd, 0, size)
+            return
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS:
+                raise
+    os.ftruncate(dst_fd, size)
+
+def _parallel(src_fd, dst_fd, size, progress, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_CHUNK_WORKERS):
+    """预分配目标文件后，由多个线程用 os.pread/os.pwrite 并行复制互不重叠的数据块"""
+    if not hasattr(os, 'pread'):
+        raise OSError(errno.ENOSYS, "当前平台不支持 pread/pwrite")
+    _preallocate(dst_fd, size)
+    lock = threading.Lock()
+    # 复制过程中源文件变短时，最终长度为最早遇到文件结尾的位置
+    end_of_file = [size]
+
+    def report(num_bytes):
+        with lock:
+            progress(num_bytes)
+
+    def copy_range(offset, end):
+        while offset < end:
+            data = os.pread(src_fd, min(PARALLEL_BUFFER_SIZE, end - offset), offset)
+            if not data:
+                with lock:
+                    end_of_file[0] = min(end_of_file[0], offset)
+                return
+            view = memoryview(data)
+            position = offset
+            while view:
+                written = os.pwrite(dst_fd, view, position)
+                view = view[written:]
+                position += written
+            offset += len(data)
+            if progress:
+                report(len(data))
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='ChunkCopy') as executor:
+        futures = [executor.submit(copy_range, offset, min(offset + chunk_size, size))
+                   for offset in range(0, size, chunk_size)]
+        for future in futures:
+            future.result()
+    if end_of_file[0] < size:
+        os.ftruncate(dst_fd, end_of_file[0])
+
+# 复制方式对应的尝试顺序
+_STRATEGIES = {
+    'auto': (('reflink', _reflink), ('copy_file_range', _copy_file_range),
+             ('sendfile', _sendfile), ('userspace', _userspace)),
+    'reflink': (('reflink', _reflink),),
+    'kernel': (('copy_file_range', _copy_file_range), ('sendfile', _sendfile)),
+    'userspace': (('userspace', _userspace),),
+}
+
+def _reset(src_fd, dst_fd):
+    """回退前把文件位置和目标文件内容恢复到初始状态（已报告的进度由调用方撤销）"""
+    os.lseek(src_fd, 0, os.SEEK_SET)
+    os.lseek(dst_fd, 0, os.SEEK_SET)
+    os.ftruncate(dst_fd, 0)
+
+def _strategies(method, size, parallel):
+    """返回该文件要依次尝试的复制方式
+
+    指定了 parallel 且文件不小于阈值时，auto 在 reflink 之后优先尝试并行分块复制（不支持时仍回退到
+    内核复制和用户态复制），userspace 直接使用并行分块复制。
+    """
+    strategies = _STRATEGIES[method]
+    if parallel is None or size < parallel.threshold or method not in ('auto', 'userspace'):
+        return strategies
+    chunked = ('parallel', lambda src_fd, dst_fd, size, progress: _parallel(
+        src_fd, dst_fd, size, progress, parallel.chunk_size, parallel.workers))
+    if method == 'auto':
+        return (strategies[0], chunked) + strategies[1:]
+    return (chunked,)
+
+def copyfile(src, dst, method='auto', progress=None, parallel=None):
+    """只复制文件内容，返回实际使用的复制方式名称
+
+    progress 为可选回调，每复制一个数据块调用一次，参数为该块的字节数；
+    某种方式中途回退时会以负数撤销已报告的字节。
+    parallel 为可选的 ParallelCopy，不小于其阈值的文件使用多线程分块复制。
+    """
+    if method not in _STRATEGIES:
+        raise ValueError(f"未知的复制方式: {method}")
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} 和 {dst!r} 是同一个文件")
+
+    flags = getattr(os, 'O_BINARY', 0)
+    src_fd = os.open(src, os.O_RDONLY | flags)
+    try:
+        src_stat = os.fstat(src_fd)
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | flags, 0o666)
+        try:
+            dev_key = (src_stat.st_dev, os.fstat(dst_fd).st_dev)
+            last_error = None
+            reported = [0]
+
+            def report(num_bytes):
+                reported[0] += num_bytes
+                progress(num_bytes)
+
+            for name, func in _strategies(method, src_stat.st_size, parallel):
+                if (name, dev_key) in _unsupported:
+                    continue
+                try:
+                    func(src_fd, dst_fd, src_stat.st_size, report if progress else None)
+                    return name
+                except OSError as e:
+                    if not isinstance(e, _IncompleteCopy) and e.errno not in _FALLBACK_ERRNOS:
+                        raise
+                    last_error = e
+                    if e.errno in _UNSUPPORTED_ERRNOS:
+                        with _unsupported_lock:
+                            _unsupported.add((name, dev_key))
+                    _reset(src_fd, dst_fd)
+                    if reported[0]:
+                        progress(-reported[0])
+                        reported[0] = 0
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+    # 所有方式都不可用：删除已创建的空目标文件
+    os.remove(dst)
+    raise CopyMethodUnsupported(
+        errno.ENOTSUP,
+        f"复制方式 {method} 不可用: {last_error.strerror if last_error else '已确认不支持'}")
+
+def copy2(src, dst, method='auto', progress=None, parallel=None):
+    """复制文件内容与元数据（与 shutil.copy2 相同的语义），返回目标路径"""
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    copyfile(src, dst, method, progress, parallel)
+    shutil.copystat(src, dst)
+    return dst
+
+def new_digest():
+    """校验使用的摘要算法（与内容去重相同的 BLAKE2b）"""
+    return hashlib.blake2b(digest_size=20)
+
+def _bypass_cache(fd):
+    """尽量让后续读取不命中页缓存：macOS 使用 F_NOCACHE，Linux 等平台丢弃该文件已缓存的页"""
+    if fcntl is not None and hasattr(fcntl, 'F_NOCACHE'):
+        try:
+            fcntl.fcntl(fd, fcntl.F_NOCACHE, 1)
+        except OSError:
+            pass
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+def read_digest(path):
+    """读回文件并计算摘要，读取前尽量丢弃其页缓存，使校验读到的是存储设备上的数据"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        _bypass_cache(fd)
+        hasher = new_digest()
+        while True:
+            data = os.read(fd, VERIFY_BUFFER_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+        # 校验读取的数据不再使用，不让它挤占页缓存
+        _bypass_cache(fd)
+        return hasher.hexdigest()
+    finally:
+        os.close(fd)
+
+def copy2_verified(src, dst, progress=None):
+    """复制文件内容与元数据并校验，返回源数据的十六进制摘要
+
+    复制只使用用户态读写，在同一次读取中计算源数据的摘要；写完后同步到磁盘，
+    再通过 read_digest 读回目标文件比较，不一致时抛出 VerifyFailed（目标文件保留，便于排查）。
+    progress 的含义与 copyfile 相同（读回阶段不报告进度）。
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} 和 {dst!r} 是同一个文件")
+    flags = getattr(os, 'O_BINARY', 0)
+    hasher = new_digest()
+    src_fd = os.open(src, os.O_RDONLY | flags)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | flags, 0o666)
+        try:
+            _userspace(src_fd, dst_fd, None, progress, hasher)
+            # 先写回磁盘，读回时丢弃页缓存才有效
+            os.fsync(dst_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    shutil.copystat(src, dst)
+    expected = hasher.hexdigest()
+    actual = read_digest(dst)
+    if actual != expected:
+        raise VerifyFailed(errno.EIO, f"校验失败：目标文件摘要 {actual} 与源数据摘要 {expected} 不一致")
+    return expected
@@ -3,119 +3,1498 @@ import os
 import shutil
 import argparse
 import datetime
+import json
+import csv
+import sqlite3
+import hashlib
+import errno
+import re
 import sys
+import signal
+import time
+import queue
+import threading
+from collections import namedtuple
 from pathlib import Path
 import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from tqdm import tqdm
+import copy_backend
+from progress import ProgressTracker, format_size, parse_size
+from functools import lru_cache
+from file_filter import FileFilter, DirFilter, normalize_extensions
+from scan_index import ScanIndex
+from archive_sink import ArchiveSink, ARCHIVE_FORMATS
+from job_control import JobControl, JobCancelled
+from profiler import NULL_PROFILER, DEFAULT_SLOWEST, JobProfiler, format_report, write_report
 
-def setup_logger(dest_dir):
-    """设置日志记录器"""
+# 日志格式：text 为原有的文本日志，jsonl 为每行一条 JSON 的结构化日志
+LOG_FORMATS = ('text', 'jsonl')
+
+# 后台日志线程每批写入的最大记录数，以及缓冲记录的最长时间（秒）
+LOG_BATCH_SIZE = 256
+LOG_FLUSH_INTERVAL = 1.0
+
+# 结构化日志记录中的操作字段
+LOG_FIELDS = ('op', 'src', 'dst', 'bytes', 'duration', 'digest', 'error')
+
+class JsonlFormatter(logging.Formatter):
+    """把日志记录格式化为一行 JSON，包含操作、源、目标、字节数、耗时和错误"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        data['message'] = record.getMessage()
+        return json.dumps(data, ensure_ascii=False)
+
+class BatchFileHandler(logging.Handler):
+    """批量写入的文件处理器
+
+    由后台日志线程（QueueListener）调用，记录先放入缓冲区，
+    达到 LOG_BATCH_SIZE 条或距上次写入超过 LOG_FLUSH_INTERVAL 秒时一次性写入文件。
+    """
+
+    def __init__(self, filename, encoding='utf-8'):
+        super().__init__()
+        self.stream = open(filename, 'a', encoding=encoding)
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= LOG_BATCH_SIZE or time.monotonic() - self.last_flush >= LOG_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                self.stream.write('\n'.join(self.buffer) + '\n')
+                self.stream.flush()
+                self.buffer = []
+            self.last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        self.stream.close()
+        super().close()
+
+# 每个日志文件对应的后台写入线程
+_log_listeners = {}
+_log_listeners_lock = threading.Lock()
+
+def setup_logger(dest_dir, log_format='text'):
+    """设置日志记录器
+
+    日志记录先进入内存队列，由后台线程批量写入目标目录中的日志文件，
+    复制线程不会因为写日志而阻塞。使用完毕后需要调用 shutdown_logger 写完剩余记录。
+    每次调用返回独立的记录器和日志文件，多个作业可以在同一进程中同时运行（见 batch_jobs）。
+    """
     # 获取目标目录的名称（去掉路径中的斜杠）
     dest_dir_name = os.path.basename(os.path.normpath(dest_dir))
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_filename = f"{dest_dir_name}_{timestamp}_copy.log"
-    log_path = os.path.join(dest_dir, log_filename)
+    suffix = 'jsonl' if log_format == 'jsonl' else 'log'
+    with _log_listeners_lock:
+        # 同一秒内写入同一目标目录的作业追加编号，不共用日志文件
+        log_path = os.path.join(dest_dir, f"{dest_dir_name}_{timestamp}_copy.{suffix}")
+        counter = 1
+        while log_path in _log_listeners:
+            log_path = os.path.join(dest_dir, f"{dest_dir_name}_{timestamp}_{counter}_copy.{suffix}")
+            counter += 1
+        _log_listeners[log_path] = None
     
-    # 创建日志记录器
-    logger = logging.getLogger('FileOperations')
+    # 创建日志记录器（不在 logging 的全局表中注册，作业结束后即可释放）
+    logger = logging.Logger('FileOperations')
     logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.log_path = log_path
     
-    # 如果已经有处理器，先移除它们
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
-    
-    # 创建文件处理器
-    fh = logging.FileHandler(log_path, encoding='utf-8')
+    # 创建批量写入的文件处理器
+    try:
+        fh = BatchFileHandler(log_path, encoding='utf-8')
+    except OSError:
+        with _log_listeners_lock:
+            del _log_listeners[log_path]
+        raise
     fh.setLevel(logging.INFO)
     
     # 设置日志格式
-    formatter = logging.Formatter('%(asctime)s - %(message)s')
+    if log_format == 'jsonl':
+        formatter = JsonlFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(message)s')
     fh.setFormatter(formatter)
     
-    logger.addHandler(fh)
+    # 通过队列交给后台线程写入
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, fh)
+    listener.start()
+    with _log_listeners_lock:
+        _log_listeners[log_path] = listener
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
     return logger
 
-def should_process_file(filename, include_keywords, exclude_keywords, extensions):
-    """判断文件是否应该被处理"""
-    name_without_ext = os.path.splitext(filename)[0]
-    
-    # 检查文件扩展名
-    if extensions and not any(filename.endswith(ext) for ext in extensions):
-        return False
-    
-    # 检查排除关键词
-    if exclude_keywords and any(keyword in name_without_ext for keyword in exclude_keywords):
-        return False
-    
-    # 检查包含关键词
-    if include_keywords and not any(keyword in name_without_ext for keyword in include_keywords):
+def latest_log(dest_dir):
+    """返回目标目录中最新的操作日志路径，没有时返回 None"""
+    try:
+        with os.scandir(dest_dir) as it:
+            logs = [entry for entry in it
+                    if entry.is_file() and entry.name.endswith(('_copy.log', '_copy.jsonl'))]
+    except OSError:
+        return None
+    if not logs:
+        return None
+    return max(logs, key=lambda entry: entry.stat().st_mtime).path
+
+def shutdown_logger(logger):
+    """停止后台日志线程并写入所有剩余记录"""
+    with _log_listeners_lock:
+        listener = _log_listeners.pop(logger.log_path, None)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+# 同步模式下判断修改时间相同的容差（秒），兼容 FAT 等低精度文件系统
+SYNC_MTIME_TOLERANCE = 2.0
+
+def is_unchanged(source_file, dest_path):
+    """目标文件存在且大小、修改时间与源文件一致时返回 True
+
+    同步模式据此跳过已完成的文件：中断后重新运行时，已复制完成的目标文件与源文件一致，
+    写了一半的目标文件大小或修改时间不同，会重新处理。
+    """
+    try:
+        st = os.stat(dest_path)
+    except OSError:
         return False
-    
-    return True
+    return st.st_size == source_file.size and abs(st.st_mtime - source_file.mtime) <= SYNC_MTIME_TOLERANCE
+
+@lru_cache(maxsize=32)
+def _cached_filter(extensions, include_keywords, exclude_keywords):
+    """按参数缓存编译好的筛选器"""
+    return FileFilter(extensions, include_keywords, exclude_keywords)
+
+def should_process_file(filename, include_keywords, exclude_keywords, extensions):
+    """判断文件是否应该被处理
+
+    为兼容保留的接口；批量处理时请直接构建 FileFilter 并复用。
+    """
+    file_filter = _cached_filter(tuple(extensions or ()), tuple(include_keywords or ()),
+                                 tuple(exclude_keywords or ()))
+    return file_filter.match(filename)
+
+# 扫描阶段产出的文件记录
+SourceFile = namedtuple('SourceFile', ['path', 'size', 'mtime'])
+
+# 扫描线程与复制阶段之间的队列容量
+SCAN_QUEUE_SIZE = 1024
+
+def _normalize_dir(path):
+    """规范化目录路径，便于比较"""
+    return os.path.normcase(os.path.abspath(path))
+
+def _dir_allowed(dir_filter, source_dir, entry, depth):
+    """按目录剪枝规则判断是否进入该子目录"""
+    rel_path = os.path.relpath(entry.path, source_dir) if dir_filter.needs_rel_path else None
+    return dir_filter.allow(entry.name, depth, rel_path)
+
+def _iter_directory(source_dir, current, depth, subdirs, name_filter=None, skip_dirs=None, dir_filter=None):
+    """枚举单个目录：产出其中匹配的文件，并把需要继续遍历的子目录 (路径, 深度) 追加到 subdirs
+
+    无法读取的目录直接结束，不抛出异常。
+    """
+    try:
+        with os.scandir(current) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if entry.is_symlink():
+                        continue
+                    if skip_dirs and _normalize_dir(entry.path) in skip_dirs:
+                        continue
+                    if dir_filter and not _dir_allowed(dir_filter, source_dir, entry, depth + 1):
+                        continue
+                    subdirs.append((entry.path, depth + 1))
+                    continue
+                if name_filter and not name_filter(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                    yield SourceFile(entry.path, st.st_size, st.st_mtime)
+                except OSError:
+                    # 无法获取信息的文件（如失效的链接）交给后续处理阶段报告错误
+                    yield SourceFile(entry.path, 0, 0.0)
+    except OSError:
+        return
+
+def iter_files(source_dir, name_filter=None, skip_dirs=None, dir_filter=None):
+    """使用 os.scandir 逐个产出源目录下的文件（生成器，不构建完整列表）
+
+    name_filter 为可选的文件名判断函数，只有返回 True 的文件才会被 stat 并产出。
+    skip_dirs 为不需要进入的目录集合（如位于源目录内部的目标目录）。
+    dir_filter 为 DirFilter，被排除的目录及超过最大深度的目录不会被枚举。
+    与 os.walk 一致：不进入指向目录的符号链接，无法读取的目录会被跳过。
+    """
+    skip_dirs = {_normalize_dir(d) for d in skip_dirs} if skip_dirs else None
+    stack = [(source_dir, 0)]
+    while stack:
+        current, depth = stack.pop()
+        subdirs = []
+        yield from _iter_directory(source_dir, current, depth, subdirs, name_filter, skip_dirs, dir_filter)
+        # 逆序入栈，保证按目录顺序深度优先遍历
+        stack.extend(reversed(subdirs))
+
+def iter_files_parallel(source_dir, workers=1, name_filter=None, skip_dirs=None, dir_filter=None):
+    """与 iter_files 相同，但由多个线程同时枚举不同的目录
+
+    每个任务枚举一个目录，完成后把其子目录作为新任务提交，适合网络共享等
+    单次目录读取延迟较高的场景。产出顺序不固定；workers 为 1 时退化为 iter_files。
+    """
+    if workers <= 1:
+        yield from iter_files(source_dir, name_filter, skip_dirs, dir_filter)
+        return
+    skip_dirs = {_normalize_dir(d) for d in skip_dirs} if skip_dirs else None
+
+    def list_directory(item):
+        current, depth = item
+        subdirs = []
+        files = list(_iter_directory(source_dir, current, depth, subdirs, name_filter, skip_dirs, dir_filter))
+        return files, subdirs
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='DirScanner') as executor:
+        pending = {executor.submit(list_directory, (source_dir, 0))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    pending.add(executor.submit(list_directory, subdir))
+                yield from files
+
+def iter_indexed_files(scan_index, source_dir, name_filter=None, skip_dirs=None, dir_filter=None):
+    """与 iter_files 相同，但通过 ScanIndex 遍历：只重新列出修改时间变化的目录"""
+    return map(SourceFile._make, scan_index.iter_files(source_dir, name_filter, skip_dirs, dir_filter))
+
+def restat_files(files):
+    """重新读取每个文件当前的大小和修改时间，跳过已不存在的文件
+
+    扫描索引只在目录的修改时间变化时重新列出目录，而在原处修改文件内容不会改变目录的修改时间，
+    索引中的大小和修改时间可能是旧值。复制、移动和生成计划前对匹配的文件重新 stat，
+    增量同步的比较、日志和进度都基于文件的当前状态（不匹配的文件仍然不需要访问文件系统）。
+    """
+    for source_file in files:
+        try:
+            st = os.stat(source_file.path)
+        except OSError:
+            continue
+        yield SourceFile(source_file.path, st.st_size, st.st_mtime)
 
 def get_all_files(source_dir):
     """获取所有文件的列表"""
-    all_files = []
-    for root, _, files in os.walk(source_dir):
-        for file in files:
-            all_files.append(os.path.join(root, file))
-    return all_files
-
-def process_files(source_dir, dest_dir, extensions, include_keywords, exclude_keywords, is_move=False, keep_structure=False, log_enabled=True):
-    """处理文件（复制或移动）"""
+    return [f.path for f in iter_files(source_dir)]
+
+def _start_scanner(scan_iter, tracker=None, maxsize=SCAN_QUEUE_SIZE):
+    """在后台线程中运行扫描生成器，通过有界队列把匹配的文件交给复制阶段
+
+    tracker 为 ProgressTracker 时，扫描到的文件数和字节数会被累加到进度总量中。
+    返回 (队列, 扫描状态)。队列以 None 作为结束标记；扫描状态中的
+    discovered 随扫描进行不断增加，done 表示扫描结束，error 保存扫描异常，
+    设置 stop 事件可让扫描线程提前退出。
+    """
+    file_queue = queue.Queue(maxsize=maxsize)
+    state = {'discovered': 0, 'done': False, 'error': None, 'stop': threading.Event()}
+
+    def put(item):
+        # 队列已满时定期检查停止标记，避免复制阶段异常退出后扫描线程永久阻塞
+        while not state['stop'].is_set():
+            try:
+                file_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan():
+        try:
+            for source_file in scan_iter:
+                state['discovered'] += 1
+                if tracker is not None:
+                    tracker.add_total(source_file.size, getattr(source_file, 'files', 1))
+                if not put(source_file):
+                    return
+        except Exception as e:
+            state['error'] = e
+        finally:
+            state['done'] = True
+            if tracker is not None:
+                tracker.set_scan_done()
+            put(None)
+
+    threading.Thread(target=scan, name='FileScanner', daemon=True).start()
+    return file_queue, state
+
+# 队列暂时为空时 _drain_queue 产出的占位标记，让调用方有机会刷新进度
+IDLE = object()
+
+# 等待工作线程或扫描线程时刷新进度的间隔（秒）
+TICK_INTERVAL = 0.2
+
+def _drain_queue(file_queue):
+    """逐个取出队列中的元素，直到遇到结束标记 None；等待超时时产出 IDLE"""
+    while True:
+        try:
+            item = file_queue.get(timeout=TICK_INTERVAL)
+        except queue.Empty:
+            yield IDLE
+            continue
+        if item is None:
+            return
+        yield item
+
+def _collect_items(items, control=None, on_idle=None):
+    """取出全部项目（丢弃 IDLE 标记），等待期间调用 on_idle 刷新进度
+
+    需要完整列表的步骤（同名选择、去重、预建目录）用它等待扫描结束；
+    control 已取消时不再等待，返回已取出的部分。
+    """
+    collected = []
+    for item in items:
+        if control is not None and control.cancelled:
+            break
+        if item is IDLE:
+            if on_idle:
+                on_idle()
+            continue
+        collected.append(item)
+    return collected
+
+def _get_dest_path(file_path, source_dir, dest_dir, keep_structure):
+    """计算源文件对应的目标路径"""
+    if keep_structure:
+        # 保持原有文件夹结构
+        return os.path.join(dest_dir, os.path.relpath(file_path, source_dir))
+    # 所有文件直接放在目标文件夹下
+    return os.path.join(dest_dir, os.path.basename(file_path))
+
+# 平铺模式下目标文件名冲突的处理方式：
+# suffix 在文件名后追加编号，parent 在文件名前加上所在文件夹的名称（仍冲突时再追加编号），
+# overwrite 只保留扫描顺序中最后一个同名文件，newest/largest 只保留修改时间最新/体积最大的文件
+COLLISION_MODES = ('suffix', 'parent', 'overwrite', 'newest', 'largest')
+
+class DestNameTable:
+    """平铺模式下的目标文件名表，用于在写入任何数据之前发现并解决同名冲突
+
+    名称不区分大小写（目标可能位于 Windows 或 macOS 的文件系统上），每个文件的判断均为 O(1)。
+    - suffix/parent 在扫描过程中逐个分配名称（streaming 为 True），不需要等待扫描结束；
+      需要改名的文件记录在 renamed 中（源路径 -> 新文件名）
+    - overwrite/newest/largest 需要看到全部同名文件才能决定保留哪一个，由 select 在扫描结束后一次完成
+    """
+
+    def __init__(self, mode='suffix'):
+        if mode not in COLLISION_MODES:
+            raise ValueError(f"未知的冲突处理方式: {mode}")
+        self.mode = mode
+        self.streaming = mode in ('suffix', 'parent')
+        # 已占用的名称 -> 下一个尝试的编号
+        self._used = {}
+        self.renamed = {}
+
+    def _reserve_numbered(self, name):
+        """为 name 分配带编号的可用名称并登记"""
+        key = name.casefold()
+        stem, ext = os.path.splitext(name)
+        number = self._used.get(key, 1)
+        while True:
+            candidate = f"{stem} ({number}){ext}"
+            number += 1
+            if candidate.casefold() not in self._used:
+                break
+        self._used[key] = number
+        self._used[candidate.casefold()] = 1
+        return candidate
+
+    def assign(self, source_file):
+        """为扫描到的文件分配目标文件名，返回新文件名；无冲突时返回 None"""
+        name = os.path.basename(source_file.path)
+        key = name.casefold()
+        if key not in self._used:
+            self._used[key] = 1
+            return None
+        if self.mode == 'parent':
+            parent = os.path.basename(os.path.dirname(source_file.path))
+            prefixed = f"{parent}_{name}" if parent else name
+            if prefixed.casefold() not in self._used:
+                self._used[prefixed.casefold()] = 1
+                new_name = prefixed
+            else:
+                new_name = self._reserve_numbered(prefixed)
+        else:
+            new_name = self._reserve_numbered(name)
+        self.renamed[source_file.path] = new_name
+        return new_name
+
+    def stream(self, files):
+        """在扫描流中逐个分配名称（在扫描线程中执行）"""
+        for source_file in files:
+            self.assign(source_file)
+            yield source_file
+
+    def select(self, files):
+        """从全部候选文件中为每个名称选出一个保留的文件
+
+        返回 (保留的文件列表, [(未处理的文件, 取代它的文件), ...])，保留的文件维持原有顺序。
+        """
+        winners = {}
+        for source_file in files:
+            key = os.path.basename(source_file.path).casefold()
+            current = winners.get(key)
+            if current is None or self._prefer(source_file, current):
+                winners[key] = source_file
+        kept = []
+        dropped = []
+        for source_file in files:
+            winner = winners[os.path.basename(source_file.path).casefold()]
+            if winner is source_file:
+                kept.append(source_file)
+            else:
+                dropped.append((source_file, winner))
+        return kept, dropped
+
+    def _prefer(self, candidate, current):
+        """判断 candidate 是否应取代当前保留的同名文件"""
+        if self.mode == 'newest':
+            return candidate.mtime > current.mtime
+        if self.mode == 'largest':
+            return candidate.size > current.size
+        # overwrite：与逐个复制时的结果一致，扫描顺序中靠后的文件覆盖前面的文件
+        return True
+
+# 移动计划中整体重命名的目录：files 为其中的文件数，size 为总字节数
+DirMove = namedtuple('DirMove', ['path', 'size', 'files'])
+
+def iter_move_plan(source_dir, name_filter=None, skip_dirs=None, dir_filter=None):
+    """生成移动计划（用于保留文件夹结构的移动）
+
+    与 iter_files 一样逐个产出 SourceFile，但对于子树中所有文件都符合筛选条件的目录，
+    只产出一个 DirMove，由执行阶段整体重命名。目录按后序遍历，内存占用只与目录深度
+    和单个目录中的文件数有关。源目录本身不会被整体重命名。
+    """
+    skip_dirs = {_normalize_dir(d) for d in skip_dirs} if skip_dirs else None
+
+    def visit(path, depth):
+        """产出该目录下需要单独处理的项目，返回 (子树是否全部匹配, 文件数, 总字节数)"""
+        matched = []
+        subdirs = []
+        complete = True
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if skip_dirs and _normalize_dir(entry.path) in skip_dirs:
+                            complete = False
+                        elif dir_filter and not _dir_allowed(dir_filter, source_dir, entry, depth + 1):
+                            # 被剪枝的目录留在原处，所在目录不能整体移动
+                            complete = False
+                        else:
+                            subdirs.append(entry.path)
+                        continue
+                    if entry.is_symlink() and entry.is_dir():
+                        # 指向目录的符号链接不会被遍历，所在目录不能整体移动
+                        complete = False
+                        continue
+                    if name_filter and not name_filter(entry.name):
+                        complete = False
+                        continue
+                    try:
+                        st = entry.stat()
+                        matched.append(SourceFile(entry.path, st.st_size, st.st_mtime))
+                    except OSError:
+                        matched.append(SourceFile(entry.path, 0, 0.0))
+                        complete = False
+        except OSError:
+            return False, 0, 0
+
+        total_files = len(matched)
+        total_size = sum(f.size for f in matched)
+        complete_children = []
+        for subdir in sorted(subdirs):
+            child_complete, child_files, child_size = yield from visit(subdir, depth + 1)
+            if child_complete:
+                complete_children.append(DirMove(subdir, child_size, child_files))
+                total_files += child_files
+                total_size += child_size
+            else:
+                complete = False
+
+        if complete and total_files > 0 and path != source_dir:
+            # 整个子树都匹配：交给上层决定是否整体移动
+            return True, total_files, total_size
+        yield from complete_children
+        yield from matched
+        return False, total_files, total_size
+
+    yield from visit(source_dir, 0)
+
+class MovePlanner:
+    """判断移动操作能否直接重命名
+
+    每个源目录只 stat 一次并缓存其设备号，与目标目录设备号相同时使用 os.replace，
+    否则复制后确认目标文件大小正确再删除源文件。
+    """
+
+    def __init__(self, dest_dir):
+        self.dest_dev = os.stat(dest_dir).st_dev
+        self._dir_devs = {}
+
+    def same_device(self, path):
+        parent = os.path.dirname(os.path.abspath(path))
+        dev = self._dir_devs.get(parent)
+        if dev is None:
+            dev = os.stat(parent).st_dev
+            self._dir_devs[parent] = dev
+        return dev == self.dest_dev
+
+class JobContext:
+    """一个作业在各工作线程之间共享的参数和状态
+
+    process_files 内部使用，也供 async_copier 等调用方配合 transfer_file 逐个处理文件。
+    调用方通常只需要前几个参数以及 sync、names、parallel、verify、control；
+    其余参数（planner、tracker、dest_paths、profiler、archive、name_filter）由 process_files 设置。
+    """
+
+    def __init__(self, source_dir, dest_dir, is_move=False, keep_structure=False, copy_method='auto',
+                 sync=False, planner=None, tracker=None, names=None, dest_paths=None, profiler=NULL_PROFILER,
+                 parallel=None, archive=None, verify=False, control=None, name_filter=None):
+        self.source_dir = source_dir
+        self.dest_dir = dest_dir
+        self.is_move = is_move
+        self.keep_structure = keep_structure
+        self.copy_method = copy_method
+        # 大文件分块并行复制的参数（copy_backend.ParallelCopy），None 表示不启用
+        self.parallel = parallel
+        # 为 True 时复制的同时计算摘要，并读回目标文件校验（见 copy_backend.copy2_verified）
+        self.verify = verify
+        # 可选的 JobControl，在文件之间和数据块之间检查暂停和取消
+        self.control = control
+        # 归档模式下写入的 ArchiveSink，此时目标路径只用于计算归档中的成员名
+        self.archive = archive
+        # 增量同步：目标中大小和修改时间一致的文件不再复制
+        self.sync = sync
+        self.planner = planner if planner is not None or not is_move else MovePlanner(dest_dir)
+        self.tracker = tracker
+        self.names = names
+        # 执行计划时由计划指定的目标路径（源路径 -> 目标路径）
+        self.dest_paths = dest_paths
+        self.profiler = profiler
+        # 文件名筛选器，整体移动目录失败后逐个移动时再次筛选
+        self.name_filter = name_filter
+        # 本次作业中已确认存在的目标目录，避免对每个文件重复调用 os.makedirs
+        self.created_dirs = set()
+
+    def ensure_dir(self, directory):
+        """确保目标目录存在；已确认存在的目录直接返回，不再访问文件系统"""
+        if directory in self.created_dirs:
+            return
+        with self.profiler.phase('makedirs'):
+            os.makedirs(directory, exist_ok=True)
+        # os.makedirs 同时创建了所有上级目录，一并登记
+        while directory not in self.created_dirs:
+            self.created_dirs.add(directory)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+
+    def dest_path(self, source_file):
+        """计算目标路径；平铺模式下因名称冲突而改名的文件使用名称表分配的新名称"""
+        if self.dest_paths is not None:
+            return self.dest_paths[source_file.path]
+        if self.names is not None:
+            new_name = self.names.renamed.get(source_file.path)
+            if new_name is not None:
+                return os.path.join(self.dest_dir, new_name)
+        return _get_dest_path(source_file.path, self.source_dir, self.dest_dir, self.keep_structure)
+
+class _FileProgress:
+    """单个项目的进度报告：累计已报告字节数，结束时交给 tracker 校正
+
+    指定 control 时每个数据块之后检查一次暂停和取消。
+    """
+
+    __slots__ = ('tracker', 'reported', 'control')
+
+    def __init__(self, tracker, control=None):
+        self.tracker = tracker
+        self.reported = 0
+        self.control = control
+
+    def __call__(self, num_bytes):
+        self.reported += num_bytes
+        self.tracker.advance(num_bytes)
+        if self.control is not None:
+            self.control.checkpoint()
+
+def _copy_file(file_path, dest_path, ctx, progress=None):
+    """按作业的复制方式复制单个文件；启用校验时返回源数据摘要，否则返回 None
+
+    复制中途被取消时删除写了一半的目标文件。
+    """
+    try:
+        if ctx.verify:
+            return copy_backend.copy2_verified(file_path, dest_path, progress)
+        copy_backend.copy2(file_path, dest_path, ctx.copy_method, progress, ctx.parallel)
+        return None
+    except JobCancelled:
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise
+
+def _move_file(source_file, dest_path, ctx, progress=None):
+    """移动单个文件：同一设备上直接重命名，跨设备时复制并确认后删除源文件
+
+    跨设备且启用校验时，只有读回校验通过才删除源文件；返回摘要（直接重命名时为 None）。
+    """
+    if ctx.planner.same_device(source_file.path):
+        try:
+            os.replace(source_file.path, dest_path)
+            return None
+        except OSError as e:
+            # 设备号相同但仍无法重命名（如不同的挂载点），改为复制后删除
+            if e.errno != errno.EXDEV:
+                raise
+    digest = _copy_file(source_file.path, dest_path, ctx, progress)
+    copied_size = os.stat(dest_path).st_size
+    if copied_size != os.stat(source_file.path).st_size:
+        raise OSError(errno.EIO, f"复制后的文件大小不一致（{copied_size} 字节），已保留源文件")
+    os.remove(source_file.path)
+    return digest
+
+def _move_directory(dir_move, ctx, progress=None):
+    """整体移动一个子树全部匹配的目录，无法重命名时逐个移动其中的文件"""
+    dest_path = os.path.join(ctx.dest_dir, os.path.relpath(dir_move.path, ctx.source_dir))
+    if ctx.planner.same_device(dir_move.path) and not os.path.lexists(dest_path):
+        ctx.ensure_dir(os.path.dirname(dest_path))
+        try:
+            with ctx.profiler.phase('copy'):
+                os.rename(dir_move.path, dest_path)
+            return {'dest': dest_path, 'bytes': dir_move.size, 'files': dir_move.files,
+                    'skipped': False, 'op': '整体移动目录'}
+        except OSError:
+            pass
+    # 扫描之后目录中可能新增了不匹配的文件，逐个移动时再次筛选，不匹配的文件留在原处
+    moved_files = moved_bytes = 0
+    for source_file in iter_files(dir_move.path, ctx.name_filter):
+        file_dest = os.path.join(ctx.dest_dir, os.path.relpath(source_file.path, ctx.source_dir))
+        ctx.ensure_dir(os.path.dirname(file_dest))
+        with ctx.profiler.phase('copy'):
+            _move_file(source_file, file_dest, ctx, progress)
+        moved_files += 1
+        moved_bytes += source_file.size
+    return {'dest': dest_path, 'bytes': moved_bytes, 'files': moved_files,
+            'skipped': False, 'op': '逐个移动目录'}
+
+def transfer_file(source_file, ctx, progress=None):
+    """按 ctx（JobContext）的参数复制或移动单个 SourceFile（或 DirMove），返回结果字典
+
+    结果中 dest 为目标路径，bytes 为实际写入的字节数，skipped 表示目标未变化而跳过（仅 sync），
+    启用校验时 digest 为源数据的摘要。progress(num_bytes) 在每个数据块之后调用。
+    可以在多个线程中同时调用；失败时抛出 OSError（取消时抛出 JobCancelled）。
+    """
+    if isinstance(source_file, DirMove):
+        return _move_directory(source_file, ctx, progress)
+    file_path = source_file.path
+    dest_path = ctx.dest_path(source_file)
+    profiler = ctx.profiler
+
+    if ctx.archive is not None:
+        if ctx.archive.is_excluded(file_path):
+            # 归档位于源目录中时不把归档自身和本次作业的日志、报告写入归档
+            return {'dest': dest_path, 'bytes': 0, 'skipped': True, 'excluded': True}
+        arcname = os.path.relpath(dest_path, ctx.dest_dir)
+        with profiler.phase('copy'):
+            ctx.archive.add(file_path, arcname, progress)
+        return {'dest': f"{ctx.archive.path}:{arcname.replace(os.sep, '/')}", 'bytes': source_file.size,
+                'skipped': False, 'op': '归档文件'}
+
+    if ctx.sync:
+        with profiler.phase('sync'):
+            unchanged = is_unchanged(source_file, dest_path)
+        if unchanged and ctx.is_move:
+            # 目标中已有相同的副本（如上次移动在复制之后、删除源文件之前中断）：只需删除源文件
+            os.remove(file_path)
+            return {'dest': dest_path, 'bytes': 0, 'skipped': False, 'op': '移动文件（目标已是相同副本）'}
+        if unchanged:
+            return {'dest': dest_path, 'bytes': 0, 'skipped': True}
+
+    if ctx.keep_structure:
+        # 确保目标文件的父目录存在
+        ctx.ensure_dir(os.path.dirname(dest_path))
+
+    # 执行复制或移动操作
+    with profiler.phase('copy'):
+        if ctx.is_move:
+            digest = _move_file(source_file, dest_path, ctx, progress)
+        else:
+            digest = _copy_file(file_path, dest_path, ctx, progress)
+    result = {'dest': dest_path, 'bytes': source_file.size, 'skipped': False}
+    if digest is not None:
+        result['digest'] = digest
+    return result
+
+def _process_single_file(source_file, ctx):
+    """复制或移动单个文件（在工作线程中执行）
+
+    返回包含目标路径 dest、字节数 bytes、是否跳过 skipped 和耗时 duration（秒）的字典。
+    ctx.sync 为 True 时启用同步模式：目标文件未变化的文件会被跳过（移动时只删除源文件）。
+    移动模式下 source_file 也可以是整体移动的 DirMove。
+    ctx.tracker 不为空时按数据块报告复制进度，结束时校正该项目的字节数。
+    ctx.control 不为空时在开始前和每个数据块之后检查暂停和取消，取消时抛出 JobCancelled；
+    写入归档时只在文件之间检查，归档中不会留下不完整的成员。
+    """
+    start = time.monotonic()
+    control = ctx.control
+    if ctx.tracker is None:
+        if control is not None:
+            control.checkpoint()
+        result = transfer_file(source_file, ctx)
+    else:
+        progress = _FileProgress(ctx.tracker, control if ctx.archive is None else None)
+        files = getattr(source_file, 'files', 1)
+        try:
+            if control is not None:
+                control.checkpoint()
+            result = transfer_file(source_file, ctx, progress)
+        except BaseException:
+            ctx.tracker.finish_file(source_file.size, progress.reported, transferred=False, files=files)
+            raise
+        ctx.tracker.finish_file(source_file.size, progress.reported, transferred=result['bytes'] > 0, files=files)
+    result['duration'] = time.monotonic() - start
+    ctx.profiler.record_file(source_file.path, source_file.size, result['duration'])
+    return result
+
+def _controlled(items, control):
+    """按 control 的状态逐个产出项目：暂停时只产出 IDLE（调用方仍可刷新进度），取消后停止产出"""
+    if control is None:
+        yield from items
+        return
+    for item in items:
+        while control.paused and not control.cancelled:
+            control.wait(TICK_INTERVAL)
+            yield IDLE
+        if control.cancelled:
+            return
+        yield item
+
+def _run_file_tasks(files, workers, task, on_idle=None):
+    """在线程池中执行任务，依次产出 (文件, 结果, 异常)
+
+    files 可以是任意可迭代对象（包括扫描队列），按需取用，遇到 IDLE 标记时不提交任务；
+    同时在途的任务数不超过 workers 的两倍，因此内存占用与文件总数无关。
+    等待期间每隔 TICK_INTERVAL 调用一次 on_idle，便于刷新进度。
+    即使 workers 为 1 也在工作线程中执行，调用线程始终可以及时刷新进度。
+    """
+    def collect(done):
+        for future in done:
+            item = pending.pop(future)
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+
+    def wait_some(timeout):
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done and on_idle:
+            on_idle()
+        return done
+
+    max_in_flight = max(workers, 1) * 2
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for item in files:
+            if item is IDLE:
+                yield from collect(wait_some(0))
+                if on_idle:
+                    on_idle()
+                continue
+            pending[executor.submit(task, item)] = item
+            while len(pending) >= max_in_flight:
+                yield from collect(wait_some(TICK_INTERVAL))
+        while pending:
+            yield from collect(wait_some(TICK_INTERVAL))
+
+# 去重时先比较的文件头部字节数，以及流式哈希的读取块大小
+DEDUP_PARTIAL_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 去重方式：skip 跳过重复文件，link 在目标目录中创建指向首个副本的硬链接
+DEDUP_MODES = ('skip', 'link')
+
+# os.link 返回这些错误码时认为目标文件系统不支持硬链接（如 FAT/exFAT、部分 SMB 共享，
+# Windows 上为 EINVAL），改为从保留副本复制
+NO_HARDLINK_ERRNOS = {errno.EPERM, errno.EOPNOTSUPP, getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP),
+                      errno.ENOSYS, errno.EXDEV, errno.EMLINK, errno.EINVAL}
+
+def file_digest(file_path, limit=None, control=None):
+    """流式计算文件的 BLAKE2b 摘要；limit 指定时只读取文件开头的部分字节
+
+    指定 control 时每读取一个数据块检查一次暂停和取消，取消时抛出 JobCancelled。
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    remaining = limit
+    with open(file_path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(HASH_CHUNK_SIZE if remaining is None else min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if control is not None:
+                control.checkpoint()
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+def _group_by_digest(groups, workers, limit=None, control=None):
+    """对每组候选文件计算摘要，返回摘要相同且文件数大于 1 的新分组"""
+    items = [f for group in groups for f in group]
+    digests = {}
+    for source_file, digest, error in _run_file_tasks(_controlled(items, control), workers,
+                                                      lambda f: file_digest(f.path, limit, control)):
+        # 无法读取的文件不参与去重，交给复制阶段报告错误
+        if error is None:
+            digests.setdefault((source_file.size, digest), []).append(source_file)
+    return {key: group for key, group in digests.items() if len(group) > 1}
+
+def find_duplicates(files, workers=1, control=None):
+    """在候选文件中查找内容完全相同的文件
+
+    先按大小分组，再比较文件头部摘要，最后只对仍然相同的文件计算完整摘要。
+    返回 [(摘要, [首个文件, 重复文件...]), ...]，每组按路径排序，首个文件作为保留副本。
+    control 为可选的 JobControl：取消后不再计算新的摘要，返回的结果不完整，调用方应丢弃。
+    """
+    by_size = {}
+    for source_file in files:
+        # 空文件没有去重价值
+        if source_file.size > 0:
+            by_size.setdefault(source_file.size, []).append(source_file)
+    candidates = [group for group in by_size.values() if len(group) > 1]
+
+    # 不超过头部长度的文件，头部摘要就是完整摘要；其余文件再计算完整摘要
+    partial = _group_by_digest(candidates, workers, DEDUP_PARTIAL_SIZE, control)
+    confirmed = {key: group for key, group in partial.items() if key[0] <= DEDUP_PARTIAL_SIZE}
+    need_full = [group for key, group in partial.items() if key[0] > DEDUP_PARTIAL_SIZE]
+    confirmed.update(_group_by_digest(need_full, workers, control=control))
+
+    result = [(digest, sorted(group, key=lambda f: f.path)) for (_, digest), group in confirmed.items()]
+    result.sort(key=lambda item: item[1][0].path)
+    return result
+
+def write_duplicate_report(dest_dir, duplicate_groups, dedup_mode):
+    """在目标目录中写入重复文件报告（JSON），返回报告路径"""
+    dest_dir_name = os.path.basename(os.path.normpath(dest_dir))
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    report_path = os.path.join(dest_dir, f"{dest_dir_name}_{timestamp}_duplicates.json")
+    groups = [{
+        'digest': digest,
+        'size': group[0].size,
+        'kept': group[0].path,
+        'duplicates': [f.path for f in group[1:]],
+    } for digest, group in duplicate_groups]
+    report = {
+        'mode': dedup_mode,
+        'groups': len(groups),
+        'duplicate_files': sum(len(g['duplicates']) for g in groups),
+        'saved_bytes': sum(g['size'] * len(g['duplicates']) for g in groups),
+        'items': groups,
+    }
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report_path
+
+def _link_duplicate(source_file, primary_dest, ctx):
+    """在目标目录中为重复文件创建指向保留副本的硬链接（在工作线程中执行）
+
+    目标文件系统不支持硬链接时改为从保留副本复制，结果的 op 中注明，记录在操作日志里。
+    """
+    dest_path = ctx.dest_path(source_file)
+    if os.path.normcase(os.path.abspath(dest_path)) == os.path.normcase(os.path.abspath(primary_dest)):
+        # 平铺模式下同名的重复文件，目标中已经是相同内容
+        result = {'dest': dest_path, 'bytes': 0, 'skipped': True, 'duplicate': True}
+    elif ctx.sync and is_unchanged(source_file, dest_path):
+        result = {'dest': dest_path, 'bytes': 0, 'skipped': True}
+    else:
+        if ctx.keep_structure:
+            ctx.ensure_dir(os.path.dirname(dest_path))
+        with ctx.profiler.phase('copy'):
+            if os.path.lexists(dest_path):
+                os.remove(dest_path)
+            try:
+                os.link(primary_dest, dest_path)
+                result = {'dest': dest_path, 'bytes': 0, 'skipped': False, 'op': '硬链接文件'}
+            except OSError as e:
+                if e.errno not in NO_HARDLINK_ERRNOS:
+                    raise
+                digest = _copy_file(primary_dest, dest_path, ctx)
+                result = {'dest': dest_path, 'bytes': source_file.size, 'skipped': False,
+                          'op': f'复制文件（无法创建硬链接: {e.strerror}，已从保留副本复制）'}
+                if digest is not None:
+                    result['digest'] = digest
+    if ctx.is_move:
+        os.remove(source_file.path)
+    if ctx.tracker is not None:
+        ctx.tracker.finish_file(source_file.size, transferred=result['bytes'] > 0)
+    return result
+
+def print_summary(summary, is_move=False):
+    """打印处理结果汇总"""
+    op_type = "归档" if summary.get('archive') else ("移动" if is_move else "复制")
+    elapsed = summary['elapsed']
+    if summary.get('cancelled'):
+        print("\n作业已取消：以下为取消前完成的部分，未完成的文件保持原样（写了一半的目标文件已删除）。"
+              "使用 --sync 重新运行可跳过已完成的文件")
+    print(f"\n{op_type}完成: {summary['files']} 个文件, {format_size(summary['bytes'])}, "
+          f"失败 {summary['errors']} 个, 耗时 {elapsed:.2f} 秒")
+    if summary.get('skipped'):
+        print(f"已跳过未变化的文件: {summary['skipped']} 个")
+    if summary.get('collisions'):
+        print(f"同名文件: {summary['collisions']} 个（已改名或未处理，详见日志）")
+    if summary.get('verified'):
+        print(f"已校验: {summary['verified']} 个文件（读回目标文件的摘要与源数据一致）")
+    if summary.get('archive'):
+        print(f"归档文件: {summary['archive']} ({format_size(summary['archive_bytes'])})")
+    if summary.get('duplicates'):
+        print(f"重复文件: {summary['duplicates']} 个, 节省写入 {format_size(summary['dedup_bytes'])}")
+    print(f"平均速度: {summary['files_per_sec']:.1f} 文件/秒, "
+          f"{format_size(summary['bytes_per_sec'])}/秒")
+
+def precreate_directories(ctx, items):
+    """按路径顺序一次性创建所有项目的目标父目录，返回目录数
+
+    在复制开始之前执行，之后各工作线程只需查询 ctx.created_dirs，不会在创建目录上互相竞争。
+    """
+    directories = sorted({os.path.dirname(ctx.dest_path(item)) for item in items})
+    for directory in directories:
+        ctx.ensure_dir(directory)
+    return len(directories)
+
+def _scan_source(source_dir, dest_dir, name_filter, is_move, keep_structure, dedup=None, dir_filter=None, scan_index=None, skip_dest=True):
+    """按作业参数选择扫描方式，返回产出 SourceFile（或 DirMove）的迭代器
+
+    skip_dest 为 False 时不跳过目标目录（归档模式下 dest_dir 只是归档和日志所在的目录，
+    其中的其他文件照常归档，归档自身、日志和报告由 ArchiveSink.is_excluded 排除）。
+    """
+    # 目标目录位于源目录内部时不扫描它，避免把刚复制的文件再次处理；
+    # 保留结构的移动使用移动计划，子树全部匹配的目录整体重命名（去重时需要逐个文件比较）
+    skip_dirs = [dest_dir] if skip_dest else None
+    if is_move and keep_structure and not dedup:
+        return iter_move_plan(source_dir, name_filter, skip_dirs=skip_dirs, dir_filter=dir_filter)
+    if scan_index is not None:
+        return restat_files(iter_indexed_files(scan_index, source_dir, name_filter, skip_dirs=skip_dirs,
+                                               dir_filter=dir_filter))
+    return iter_files(source_dir, name_filter, skip_dirs=skip_dirs, dir_filter=dir_filter)
+
+def process_files(source_dir, dest_dir, extensions, include_keywords, exclude_keywords, is_move=False, keep_structure=False, log_enabled=True, workers=1, copy_method='auto', sync=False, dedup=None, file_filter=None, dir_filter=None, progress_callback=None, show_progress=True, quiet=False, log_format='text', scan_index=None, on_collision='suffix', plan=None, profiler=None, precreate_dirs=False, parallel=None, archive=None, verify=False, control=None, show_summary=True):
+    """处理文件（复制或移动）
+
+    workers 指定并发处理的线程数，默认为 1（顺序处理）。
+    copy_method 指定复制方式，取值见 copy_backend.COPY_METHODS。
+    parallel 为可选的 copy_backend.ParallelCopy，不小于其阈值的文件预分配目标空间后
+    由多个线程分块并行复制（仅对 auto 和 userspace 复制方式有效，auto 时仍优先尝试 reflink）。
+    sync 为 True 时启用增量同步：跳过目标中大小和修改时间一致的文件（移动时只删除源文件），
+    中断后重新运行即从停止处继续。
+    verify 为 True 时在复制的同一次读取中计算源数据的 BLAKE2b 摘要，写完后绕过页缓存读回目标文件校验，
+    摘要写入操作日志；此时只使用用户态复制（copy_method 和 parallel 被忽略）。跨设备移动只有校验
+    通过才删除源文件；同一设备上的移动只是重命名，不涉及数据复制，无需校验。
+    dedup 为 'skip' 或 'link' 时启用内容去重：重复文件被跳过，或在目标中
+    硬链接到首个副本，并在目标目录中生成重复文件报告。去重需要完整的候选
+    列表，因此会等待扫描结束后才开始复制。
+    file_filter 为预先编译的 FileFilter，指定时忽略 extensions、include_keywords
+    和 exclude_keywords。
+    dir_filter 为 DirFilter，用于在遍历时剪枝被排除的目录并限制遍历深度。
+    scan_index 为可选的 ScanIndex，指定时通过索引扫描源目录（保留结构的移动除外）。
+    on_collision 为平铺模式下同名文件的处理方式，取值见 COLLISION_MODES（默认 suffix）；
+    overwrite、newest 和 largest 需要等待扫描结束，未被保留的同名文件不会被处理。
+    plan 为 build_plan 生成（或 load_plan 读取）的执行计划，指定时不再扫描源目录，
+    按计划中的操作执行，筛选、同名和去重相关的参数均被忽略（通常通过 execute_plan 调用）。
+    precreate_dirs 为 True 且保留文件夹结构时，先等待扫描结束，按路径顺序一次性创建全部目标目录，
+    再开始复制（复制过程中不再创建目录）。
+    archive 为归档文件路径（后缀见 archive_sink.ARCHIVE_FORMATS），指定时匹配的文件不再复制到
+    目标目录，而是以流的方式写入该归档，成员名为文件在目标目录中的相对路径（与 keep_structure
+    和 on_collision 的规则相同）；dest_dir 只用于保存日志和报告。归档不能与移动、增量同步、
+    硬链接去重或执行计划一起使用。
+    control 为可选的 JobControl，用于从其他线程暂停、继续或取消作业：暂停后不再开始新的文件，
+    正在复制的文件在当前数据块之后等待；取消后不再开始新的文件，正在复制的文件在当前数据块之后停止，
+    写了一半的目标文件被删除（移动时源文件保持不动）。已完成的文件不受影响，配合 sync 重新运行即可
+    跳过它们；取消时返回的汇总中 cancelled 为 True。
+    profiler 为可选的 JobProfiler，指定时记录各阶段耗时、按文件大小分档的耗时分布和最慢的文件，
+    结束时打印分析结果并在目标目录中保存 *_profile.json 报告（图形界面可传入自己的实例读取报告）。
+    progress_callback 为可选的进度回调，在调用 process_files 的线程中定期调用，
+    参数为 ProgressTracker.snapshot() 返回的字典（按字节统计，含速度和剩余时间）。
+    show_progress 为 False 时不显示命令行进度条（图形界面使用进度回调代替）。
+    quiet 为 True 时控制台不再逐个输出处理的文件（错误和汇总仍会输出），日志文件内容不变。
+    show_summary 为 False 时不打印汇总（批量作业由调用方统一输出各任务的结果）。
+    log_format 为日志格式，取值见 LOG_FORMATS：text 为文本日志，jsonl 为结构化的 JSON Lines 日志。
+    返回包含文件数、字节数、失败数、耗时及吞吐量的汇总字典。
+    """
+    if archive is not None and (is_move or sync or dedup == 'link' or plan is not None or verify):
+        raise ValueError("归档模式不能与移动、增量同步、硬链接去重、执行计划或校验一起使用")
+
     # 确保目标目录存在
     os.makedirs(dest_dir, exist_ok=True)
+    archive_sink = ArchiveSink(archive) if archive is not None else None
     
     # 设置日志记录器
     logger = None
     if log_enabled:
-        logger = setup_logger(dest_dir)
-    
-    # 获取所有文件
-    all_files = get_all_files(source_dir)
-    files_to_process = [f for f in all_files if should_process_file(
-        os.path.basename(f), include_keywords, exclude_keywords, extensions)]
+        logger = setup_logger(dest_dir, log_format)
+        if archive_sink is not None:
+            archive_sink.exclude(logger.log_path)
     
-    if not files_to_process:
-        print("没有找到匹配的文件")
-        return
-    
-    # 创建进度条
-    pbar = tqdm(total=len(files_to_process), desc='处理进度', unit='file')
+    # 扫描与复制流水线：扫描线程边遍历边筛选，复制阶段从有界队列中取用
+    name_filter = file_filter or FileFilter(extensions, include_keywords, exclude_keywords)
+    profiler = profiler or NULL_PROFILER
+    if profiler.enabled:
+        name_filter = profiler.wrap('filter', name_filter)
+
+    if plan is not None:
+        # 执行预先生成的计划：不再扫描，目标路径和硬链接关系均由计划给出
+        scan_iter = iter_plan(plan)
+        names = None
+    else:
+        scan_iter = _scan_source(source_dir, dest_dir, name_filter, is_move, keep_structure, dedup,
+                                 dir_filter, scan_index, skip_dest=archive_sink is None)
+        if profiler.enabled:
+            scan_iter = profiler.timed_iter('scan', scan_iter)
+        # 平铺模式下通过名称表处理同名文件
+        names = None if keep_structure else DestNameTable(on_collision)
+        if names is not None and names.streaming:
+            scan_iter = names.stream(scan_iter)
+    tracker = ProgressTracker()
+    file_queue, scan_state = _start_scanner(scan_iter, tracker)
     
-    for file_path in files_to_process:
-        try:
-            if keep_structure:
-                # 保持原有文件夹结构
-                rel_path = os.path.relpath(file_path, source_dir)
-                dest_path = os.path.join(dest_dir, rel_path)
-                # 确保目标文件的父目录存在
-                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    op_type = "归档" if archive_sink is not None else ("移动" if is_move else "复制")
+    log_op = 'archive' if archive_sink is not None else ('move' if is_move else 'copy')
+    summary = {'files': 0, 'bytes': 0, 'errors': 0, 'skipped': 0, 'collisions': 0, 'verified': 0}
+    start_time = time.monotonic()
+    ctx = JobContext(source_dir, dest_dir, is_move, keep_structure, copy_method, sync, tracker=tracker,
+                     names=names, dest_paths=plan_dest_paths(plan) if plan is not None else None,
+                     profiler=profiler, parallel=parallel, archive=archive_sink, verify=verify,
+                     control=control, name_filter=name_filter)
+
+    def task(source_file):
+        return _process_single_file(source_file, ctx)
+
+    # 创建按字节计数的进度条（总量随扫描进行逐步增加）
+    pbar = tqdm(total=0, desc='处理进度', unit='B', unit_scale=True, unit_divisor=1024,
+                disable=not show_progress)
+    last_update = [0.0]
+
+    def update_progress(force=False):
+        """按固定间隔把进度同步到命令行进度条和进度回调"""
+        now = time.monotonic()
+        if not force and now - last_update[0] < TICK_INTERVAL:
+            return
+        last_update[0] = now
+        with profiler.phase('progress'):
+            snapshot = tracker.snapshot()
+            if pbar.total != snapshot['total_bytes']:
+                pbar.total = snapshot['total_bytes']
+            pbar.set_postfix_str(f"{snapshot['done_files']}/{snapshot['total_files']} 文件", refresh=False)
+            pbar.update(snapshot['done_bytes'] - pbar.n)
+            if progress_callback:
+                progress_callback(snapshot)
+
+    def handle_result(source_file, result, error):
+        """记录单个文件的处理结果（日志输出与进度条更新均在当前线程中完成）"""
+        with profiler.phase('log'):
+            file_path = source_file.path
+            if error is None and result['skipped']:
+                # 重复文件已计入 duplicates，不再计为未变化的文件；归档自身和作业日志也不计入
+                if not (result.get('duplicate') or result.get('excluded')):
+                    summary['skipped'] += 1
+            elif error is None:
+                dest_path = result['dest']
+                summary['files'] += result.get('files', 1)
+                summary['bytes'] += result['bytes']
+
+                # 记录日志
+                log_msg = f"{result.get('op', op_type + '文件')}: {file_path} -> {dest_path}"
+                if 'files' in result:
+                    log_msg += f" ({result['files']} 个文件)"
+                if not quiet:
+                    print(log_msg)
+                if 'digest' in result:
+                    summary['verified'] += 1
+                if names is not None and file_path in names.renamed:
+                    summary['collisions'] += 1
+                    if logger:
+                        logger.warning(f"名称冲突: {file_path} 改名为 {names.renamed[file_path]}",
+                                       extra={'op': 'collision', 'src': file_path, 'dst': dest_path})
+                if logger:
+                    # 只在启用日志时记录到文件，结构化字段供 jsonl 格式使用
+                    digest = result.get('digest')
+                    if digest is not None:
+                        log_msg += f" [已校验 blake2b:{digest}]"
+                    logger.info(log_msg, extra={
+                        'op': log_op, 'src': file_path, 'dst': dest_path,
+                        'bytes': result['bytes'], 'duration': round(result.get('duration', 0.0), 6),
+                        'digest': digest})
+            elif isinstance(error, JobCancelled):
+                # 取消时中断的文件不计为失败，写了一半的目标文件已删除
+                if logger:
+                    logger.warning(f"已取消: {file_path}", extra={'op': 'cancel', 'src': file_path})
             else:
-                # 所有文件直接放在目标文件夹下
-                dest_path = os.path.join(dest_dir, os.path.basename(file_path))
-            
-            # 执行复制或移动操作
-            operation = shutil.move if is_move else shutil.copy2
-            operation(file_path, dest_path)
-            
-            # 记录日志
-            op_type = "移动" if is_move else "复制"
-            log_msg = f"{op_type}文件: {file_path} -> {dest_path}"
-            print(log_msg)  # 始终在控制台输出
-            if logger:
-                logger.info(log_msg)  # 只在启用日志时记录到文件
-            
-            # 更新进度条
-            pbar.update(1)
-            
-        except Exception as e:
-            error_msg = f"处理文件 {file_path} 时发生错误: {str(e)}"
-            print(error_msg, file=sys.stderr)
-            if logger:
-                logger.error(error_msg)
+                summary['errors'] += 1
+                error_msg = f"处理文件 {file_path} 时发生错误: {str(error)}"
+                print(error_msg, file=sys.stderr)
+                if logger:
+                    logger.error(error_msg, extra={
+                        'op': log_op, 'src': file_path, 'error': str(error)})
+
+        # 更新进度条
+        update_progress()
     
-    pbar.close()
+    def cancelled():
+        return control is not None and control.cancelled
+
+    completed = False
+    try:
+        files = _drain_queue(file_queue)
+        duplicate_of = {}
+        duplicates = []
+        if plan is not None:
+            duplicate_of, duplicates = plan_links(plan)
+            # 硬链接操作不经过扫描线程，单独计入进度总量
+            tracker.add_total(sum(f.size for f in duplicates), len(duplicates))
+        elif names is not None and not names.streaming:
+            # 需要看到全部同名文件才能决定保留哪一个：先等待扫描结束（取消时不再等待和选择）
+            candidates = _collect_items(files, control, update_progress)
+            if cancelled():
+                candidates = []
+            with profiler.phase('collisions'):
+                files, dropped = names.select(candidates)
+            summary['collisions'] += len(dropped)
+            for source_file, winner in dropped:
+                tracker.finish_file(source_file.size, transferred=False)
+                if logger:
+                    logger.warning(f"名称冲突: {source_file.path} 未处理，保留 {winner.path} ({on_collision})",
+                                   extra={'op': 'collision', 'src': source_file.path,
+                                          'dst': ctx.dest_path(winner)})
+            if dropped:
+                print(f"名称冲突: {len(dropped)} 个同名文件未处理（{on_collision}），详见日志")
+        if dedup and plan is None:
+            # 去重需要完整的候选列表：先等待扫描结束，再按大小和内容分组；取消时丢弃不完整的结果
+            candidates = _collect_items(files, control, update_progress)
+            with profiler.phase('dedup'):
+                duplicate_groups = find_duplicates(candidates, workers, control) if not cancelled() else []
+            if cancelled():
+                candidates, duplicate_groups = [], []
+            for _, group in duplicate_groups:
+                for duplicate in group[1:]:
+                    duplicate_of[duplicate.path] = group[0]
+            summary['duplicates'] = len(duplicate_of)
+            summary['dedup_bytes'] = sum(f.size for f in duplicate_of.values())
+            if duplicate_groups:
+                report_path = write_duplicate_report(dest_dir, duplicate_groups, dedup)
+                if archive_sink is not None:
+                    archive_sink.exclude(report_path)
+                print(f"发现 {len(duplicate_of)} 个重复文件，报告已保存到: {report_path}")
+                if logger:
+                    logger.info(f"去重: {len(duplicate_groups)} 组, {len(duplicate_of)} 个重复文件, 报告: {report_path}")
+            files = [f for f in candidates if f.path not in duplicate_of]
+            duplicates = [f for f in candidates if f.path in duplicate_of]
+
+        if precreate_dirs and keep_structure and archive_sink is None and not cancelled():
+            # 预先创建目录骨架需要完整的项目列表
+            if not isinstance(files, list):
+                files = _collect_items(files, control, update_progress)
+            if not cancelled():
+                created = precreate_directories(ctx, files + duplicates)
+                print(f"已预先创建 {created} 个目标目录")
+
+        # 工作线程只负责文件操作；只记录去重时被保留的副本的目标路径，内存占用不随文件数增长
+        primaries = {primary.path for primary in duplicate_of.values()}
+        primary_dests = {}
+        for source_file, result, error in _run_file_tasks(_controlled(files, control), workers, task, update_progress):
+            if error is None and source_file.path in primaries:
+                primary_dests[source_file.path] = result['dest']
+            handle_result(source_file, result, error)
+
+        if duplicate_of:
+            def duplicate_task(source_file):
+                primary_dest = primary_dests.get(duplicate_of[source_file.path].path)
+                if dedup == 'skip':
+                    # 跳过模式下重复的源文件保持不动（移动模式也不删除）
+                    tracker.finish_file(source_file.size, transferred=False)
+                    return {'dest': primary_dest, 'bytes': 0, 'skipped': True, 'duplicate': True}
+                if primary_dest is None:
+                    # 保留副本处理失败时按普通文件处理
+                    return task(source_file)
+                return _link_duplicate(source_file, primary_dest, ctx)
+
+            for source_file, result, error in _run_file_tasks(_controlled(duplicates, control), workers,
+                                                                  duplicate_task, update_progress):
+                handle_result(source_file, result, error)
+        completed = True
+    finally:
+        scan_state['stop'].set()
+        if archive_sink is not None:
+            archive_sink.close()
+        update_progress(force=True)
+        pbar.close()
+        # 正常结束时写完汇总后再停止日志线程，其余情况在这里停止
+        if logger and not (completed and scan_state['error'] is None and scan_state['discovered']):
+            shutdown_logger(logger)
+
+    if scan_state['error'] is not None:
+        raise scan_state['error']
+
+    if scan_state['discovered'] == 0:
+        if show_summary:
+            print("没有找到匹配的文件")
+        return None
+
+    elapsed = max(time.monotonic() - start_time, 1e-9)
+    summary['cancelled'] = control is not None and control.cancelled
+    summary['elapsed'] = elapsed
+    summary['files_per_sec'] = summary['files'] / elapsed
+    summary['bytes_per_sec'] = summary['bytes'] / elapsed
+    if archive_sink is not None:
+        summary['archive'] = archive_sink.path
+        summary['archive_bytes'] = os.path.getsize(archive_sink.path)
+    if show_summary:
+        print_summary(summary, is_move)
+    if profiler.enabled:
+        report = profiler.report()
+        print(format_report(report))
+        dest_dir_name = os.path.basename(os.path.normpath(dest_dir))
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        summary['profile_report'] = os.path.join(dest_dir, f"{dest_dir_name}_{timestamp}_profile.json")
+        write_report(report, summary['profile_report'])
+        print(f"性能分析报告已保存到: {summary['profile_report']}")
+    if logger:
+        summary['log_path'] = logger.log_path
+        logger.info(f"汇总: {op_type} {summary['files']} 个文件, {summary['bytes']} 字节, "
+                    f"跳过 {summary['skipped']} 个, 同名 {summary['collisions']} 个, 失败 {summary['errors']} 个, 耗时 {elapsed:.2f} 秒, 线程数 {workers}"
+                    + ("（已取消）" if summary['cancelled'] else ""),
+                    extra={'op': 'summary', 'bytes': summary['bytes'], 'duration': round(elapsed, 6)})
+        shutdown_logger(logger)
+    return summary
+
+# 执行计划文件的格式版本（2 起计划中只记录单个文件，不再有整体移动的目录）
+PLAN_VERSION = 2
+
+def _existing_ancestor(path):
+    """返回 path 自身或其最近的已存在的上级目录"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+def _count_missing_dirs(dest_paths):
+    """统计放置这些目标路径需要新建的目录数（每个目录只检查一次）"""
+    existing = set()
+    missing = set()
+    for dest_path in dest_paths:
+        directory = os.path.dirname(dest_path)
+        while directory not in existing and directory not in missing:
+            if os.path.isdir(directory):
+                existing.add(directory)
+                break
+            missing.add(directory)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+    return len(missing)
+
+def _expand_dir_moves(items, name_filter):
+    """把整体移动的目录（DirMove）展开为其中匹配的文件"""
+    for item in items:
+        if isinstance(item, DirMove):
+            yield from iter_files(item.path, name_filter)
+        else:
+            yield item
+
+def build_plan(source_dir, dest_dir, extensions=None, include_keywords=None, exclude_keywords=None, is_move=False, keep_structure=False, workers=1, dedup=None, file_filter=None, dir_filter=None, scan_index=None, on_collision='suffix'):
+    """生成执行计划（不写入任何文件）
+
+    与 process_files 使用相同的扫描、同名文件处理和去重规则，返回可序列化为 JSON 的字典：
+    - operations：操作列表，op 为 copy/move/link/skip，含源路径 src、目标路径 dst 和字节数 size。
+      计划可能在生成很久之后才执行，期间目录中可能新增不匹配的文件，因此整体移动的目录
+      也展开为其中的单个文件记录，执行时只处理计划中列出的文件
+    - total_files、total_bytes：需要处理的文件数和需要写入的字节数（硬链接不写入数据）
+    - dirs_to_create：需要新建的目标目录数
+    - required_bytes、free_bytes、enough_space：目标文件系统需要的空间（同一磁盘上的移动不占用额外空间）、
+      当前可用空间及是否足够。增量同步时未变化的文件会被跳过，实际需要的空间可能更少。
+    """
+    source_dir = os.path.abspath(source_dir)
+    dest_dir = os.path.abspath(dest_dir)
+    name_filter = file_filter or FileFilter(extensions, include_keywords, exclude_keywords)
+    items = _scan_source(source_dir, dest_dir, name_filter, is_move, keep_structure, dedup, dir_filter, scan_index)
+    items = _expand_dir_moves(items, name_filter)
+    names = None if keep_structure else DestNameTable(on_collision)
+    dropped = []
+    if names is not None:
+        if names.streaming:
+            items = list(names.stream(items))
+        else:
+            items, dropped = names.select(list(items))
+    else:
+        items = list(items)
+
+    duplicate_of = {}
+    if dedup:
+        for _, group in find_duplicates(items, workers):
+            for duplicate in group[1:]:
+                duplicate_of[duplicate.path] = group[0]
+
+    planner = MovePlanner(_existing_ancestor(dest_dir)) if is_move else None
+    ctx = JobContext(source_dir, dest_dir, is_move, keep_structure, planner=planner, names=names)
+    operations = []
+    required_bytes = 0
+    for item in items:
+        primary = duplicate_of.get(item.path)
+        if primary is not None:
+            if dedup == 'link':
+                operations.append({'op': 'link', 'src': item.path, 'dst': ctx.dest_path(item), 'size': item.size,
+                                   'mtime': item.mtime, 'link_to': primary.path})
+            else:
+                operations.append({'op': 'skip', 'src': item.path, 'size': item.size,
+                                   'reason': 'duplicate', 'kept': primary.path})
+            continue
+        operation = {'op': 'move' if is_move else 'copy', 'src': item.path, 'dst': ctx.dest_path(item),
+                     'size': item.size, 'mtime': item.mtime}
+        if not is_move or not planner.same_device(item.path):
+            required_bytes += item.size
+        operations.append(operation)
+    for source_file, winner in dropped:
+        operations.append({'op': 'skip', 'src': source_file.path, 'size': source_file.size,
+                           'reason': 'collision', 'kept': winner.path})
+
+    active = [op for op in operations if op['op'] != 'skip']
+    free_bytes = shutil.disk_usage(_existing_ancestor(dest_dir)).free
+    return {
+        'version': PLAN_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'source_dir': source_dir,
+        'dest_dir': dest_dir,
+        'is_move': is_move,
+        'keep_structure': keep_structure,
+        'on_collision': None if keep_structure else on_collision,
+        'dedup': dedup,
+        'total_files': len(active),
+        'total_bytes': sum(op['size'] for op in active if op['op'] != 'link'),
+        'dirs_to_create': _count_missing_dirs(op['dst'] for op in active),
+        'required_bytes': required_bytes,
+        'free_bytes': free_bytes,
+        'enough_space': required_bytes <= free_bytes,
+        'operations': operations,
+    }
+
+def save_plan(plan, plan_path):
+    """把执行计划保存为 JSON 文件"""
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+
+def load_plan(plan_path):
+    """读取执行计划文件，格式不正确时抛出 ValueError"""
+    with open(plan_path, encoding='utf-8') as f:
+        plan = json.load(f)
+    if not isinstance(plan, dict) or 'operations' not in plan:
+        raise ValueError(f"不支持的执行计划文件: {plan_path}")
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"执行计划文件 {plan_path} 的格式版本为 {plan.get('version')}，"
+                         f"当前版本为 {PLAN_VERSION}，请重新生成计划")
+    return plan
+
+def iter_plan(plan):
+    """按计划产出需要执行的文件（SourceFile），硬链接和跳过的操作除外"""
+    for op in plan['operations']:
+        if op['op'] in ('copy', 'move'):
+            yield SourceFile(op['src'], op['size'], op['mtime'])
+
+def plan_dest_paths(plan):
+    """返回计划中每个源路径对应的目标路径"""
+    return {op['src']: op['dst'] for op in plan['operations'] if 'dst' in op}
+
+def plan_links(plan):
+    """返回计划中的硬链接操作：({重复文件路径: 保留副本}, [重复文件, ...])"""
+    sources = {op['src']: op for op in plan['operations'] if op['op'] in ('copy', 'move')}
+    duplicate_of = {}
+    duplicates = []
+    for op in plan['operations']:
+        if op['op'] == 'link':
+            primary = sources[op['link_to']]
+            duplicate_of[op['src']] = SourceFile(primary['src'], primary['size'], primary['mtime'])
+            duplicates.append(SourceFile(op['src'], op['size'], op['mtime']))
+    return duplicate_of, duplicates
+
+def format_plan_summary(plan):
+    """把执行计划的汇总信息格式化为多行文本"""
+    op_type = "移动" if plan['is_move'] else "复制"
+    skipped = sum(1 for op in plan['operations'] if op['op'] == 'skip')
+    lines = [
+        f"{op_type} {plan['total_files']} 个文件, {format_size(plan['total_bytes'])}",
+        f"需要新建目录: {plan['dirs_to_create']} 个",
+        f"目标磁盘需要空间: {format_size(plan['required_bytes'])}, 可用空间: {format_size(plan['free_bytes'])}"
+        + ("" if plan['enough_space'] else "（空间不足）"),
+    ]
+    if skipped:
+        lines.append(f"不处理的文件（同名或重复）: {skipped} 个")
+    return "\n".join(lines)
+
+def print_plan(plan, quiet=False):
+    """打印执行计划；quiet 为 True 时只打印汇总"""
+    if not quiet:
+        for op in plan['operations']:
+            if op['op'] == 'skip':
+                print(f"[skip] {op['src']} ({op['reason']}, 保留 {op['kept']})")
+            else:
+                print(f"[{op['op']}] {op['src']} -> {op['dst']}")
+    print(f"\n执行计划: {plan['source_dir']} -> {plan['dest_dir']}")
+    print(format_plan_summary(plan))
+
+def execute_plan(plan, workers=1, copy_method='auto', sync=False, log_enabled=True, progress_callback=None, show_progress=True, quiet=False, log_format='text', profiler=None, precreate_dirs=False, parallel=None, verify=False, control=None):
+    """执行预先生成的计划，返回值与 process_files 相同
+
+    计划中记录的是生成计划时的源文件状态；执行时不再扫描源目录，
+    但会重新检查目标磁盘的可用空间，不足时只输出警告。
+    """
+    free_bytes = shutil.disk_usage(_existing_ancestor(plan['dest_dir'])).free
+    if plan['required_bytes'] > free_bytes:
+        print(f"警告：目标磁盘可用空间 {format_size(free_bytes)} 小于计划需要的 "
+              f"{format_size(plan['required_bytes'])}", file=sys.stderr)
+    return process_files(plan['source_dir'], plan['dest_dir'], None, None, None, plan['is_move'],
+                         plan['keep_structure'], log_enabled, workers=workers, copy_method=copy_method,
+                         sync=sync, progress_callback=progress_callback, show_progress=show_progress,
+                         quiet=quiet, log_format=log_format, plan=plan, profiler=profiler,
+                         precreate_dirs=precreate_dirs, parallel=parallel, verify=verify, control=control)
 
 def check_dependencies():
     """检查并提示安装所需依赖"""
@@ -135,47 +1514,132 @@ def check_dependencies():
             print("程序运行需要 tqdm 依赖，请手动安装后再运行。", file=sys.stderr)
             sys.exit(1)
 
-def analyze_file_types(directory):
-    """分析目录中的文件类型及其数量"""
-    if not os.path.exists(directory):
-        print(f"错误：目录 '{directory}' 不存在", file=sys.stderr)
-        return
-    
+# 文件类型分析的默认线程数（目录枚举以 I/O 等待为主，多线程可显著缩短网络共享上的耗时）
+ANALYZE_WORKERS = 8
+
+# 文件类型分析的输出格式
+ANALYZE_FORMATS = ('text', 'json', 'csv')
+
+def collect_file_types(directory, dir_filter=None, workers=ANALYZE_WORKERS, scan_index=None):
+    """并行遍历目录，按扩展名汇总文件数、总字节数和最大的文件
+
+    scan_index 为可选的 ScanIndex，指定时通过索引遍历（只重新列出变化的目录），不再使用多线程。
+
+    返回统计字典：directory、total_files、total_bytes，以及按文件数降序排列的 types 列表，
+    其中每项包含 ext、count、bytes、largest（最大文件路径）和 largest_size。
+    """
     file_types = {}
     total_files = 0
-    
-    # 遍历目录
-    for root, _, files in os.walk(directory):
-        for file in files:
-            total_files += 1
-            # 获取文件扩展名
-            ext = os.path.splitext(file)[1].lower()
-            if not ext:  # 如果没有扩展名
-                ext = "无扩展名"
-            file_types[ext] = file_types.get(ext, 0) + 1
-    
-    # 打印结果
-    print(f"\n目录 '{directory}' 中的文件分析结果：")
+    total_bytes = 0
+    if scan_index is not None:
+        scan_iter = iter_indexed_files(scan_index, directory, dir_filter=dir_filter)
+    else:
+        scan_iter = iter_files_parallel(directory, workers, dir_filter=dir_filter)
+    for source_file in scan_iter:
+        total_files += 1
+        total_bytes += source_file.size
+        # 获取文件扩展名
+        ext = os.path.splitext(os.path.basename(source_file.path))[1].lower()
+        if not ext:  # 如果没有扩展名
+            ext = "无扩展名"
+        stats = file_types.get(ext)
+        if stats is None:
+            stats = file_types[ext] = {'ext': ext, 'count': 0, 'bytes': 0, 'largest': source_file.path,
+                                       'largest_size': source_file.size}
+        stats['count'] += 1
+        stats['bytes'] += source_file.size
+        if source_file.size > stats['largest_size']:
+            stats['largest'] = source_file.path
+            stats['largest_size'] = source_file.size
+
+    # 按数量降序排序，数量相同时按字节数降序
+    types = sorted(file_types.values(), key=lambda x: (-x['count'], -x['bytes'], x['ext']))
+    return {'directory': directory, 'total_files': total_files, 'total_bytes': total_bytes, 'types': types}
+
+def _print_file_types(stats):
+    """以文本表格打印文件类型统计"""
+    total_files = stats['total_files']
+    print(f"\n目录 '{stats['directory']}' 中的文件分析结果：")
     print(f"总文件数: {total_files}")
+    print(f"总大小: {format_size(stats['total_bytes'])}")
     print("\n文件类型统计：")
-    print("-" * 40)
-    print(f"{'文件类型':<15} {'数量':<10} {'百分比':<10}")
-    print("-" * 40)
-    
-    # 按数量降序排序
-    sorted_types = sorted(file_types.items(), key=lambda x: x[1], reverse=True)
-    for ext, count in sorted_types:
-        percentage = (count / total_files) * 100
-        print(f"{ext:<15} {count:<10} {percentage:.2f}%")
-    print("-" * 40)
+    print("-" * 72)
+    print(f"{'文件类型':<15} {'数量':<10} {'百分比':<10} {'总大小':<14} {'最大文件':<14}")
+    print("-" * 72)
+    for item in stats['types']:
+        percentage = (item['count'] / total_files) * 100
+        print(f"{item['ext']:<15} {item['count']:<10} {f'{percentage:.2f}%':<10} "
+              f"{format_size(item['bytes']):<14} {format_size(item['largest_size']):<14}")
+    print("-" * 72)
+
+def _write_file_types_csv(stats, stream):
+    """以 CSV 格式输出文件类型统计"""
+    writer = csv.writer(stream)
+    writer.writerow(['ext', 'count', 'bytes', 'largest', 'largest_size'])
+    for item in stats['types']:
+        writer.writerow([item['ext'], item['count'], item['bytes'], item['largest'], item['largest_size']])
+
+def analyze_file_types(directory, dir_filter=None, workers=ANALYZE_WORKERS, output_format='text', scan_index=None):
+    """分析目录中的文件类型及其数量、总大小和最大的文件
+
+    dir_filter 为 DirFilter，被排除的目录及超过最大深度的目录不会被遍历。
+    workers 为同时枚举目录的线程数。
+    output_format 为输出格式：text 打印表格，json/csv 向标准输出写入便于脚本处理的数据。
+    scan_index 为可选的 ScanIndex，见 collect_file_types。
+    返回 collect_file_types 的统计字典；目录不存在时返回 None。
+    """
+    if not os.path.exists(directory):
+        print(f"错误：目录 '{directory}' 不存在", file=sys.stderr)
+        return None
+
+    stats = collect_file_types(directory, dir_filter, workers, scan_index)
+    if output_format == 'json':
+        json.dump(stats, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif output_format == 'csv':
+        _write_file_types_csv(stats, sys.stdout)
+    else:
+        _print_file_types(stats)
+    return stats
+
+def open_scan_index(db_path):
+    """打开扫描索引；db_path 为空时返回 None"""
+    if not db_path:
+        return None
+    try:
+        return ScanIndex(db_path)
+    except sqlite3.Error as e:
+        print(f"错误：无法打开扫描索引 '{db_path}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+def close_scan_index(scan_index):
+    """关闭扫描索引并输出本次扫描的索引命中情况"""
+    if scan_index is None:
+        return
+    scan_index.close()
+    print(f"扫描索引: 重新列出 {scan_index.listed_dirs} 个目录, 复用 {scan_index.reused_dirs} 个目录",
+          file=sys.stderr)
+
+def cancel_on_interrupt(control):
+    """让 Ctrl-C 平稳地取消作业：第一次按下时取消并等待正在复制的文件停下，再次按下时立即退出"""
+    def handler(signum, frame):
+        if control.cancelled:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            raise KeyboardInterrupt
+        print("\n正在取消：等待正在复制的文件停下（再次按 Ctrl-C 立即退出）...", file=sys.stderr)
+        control.cancel()
+    signal.signal(signal.SIGINT, handler)
 
 def main():
     # 创建自定义用法说明
     usage = """%(prog)s 源目录 目标目录 [后缀名...] [选项]
+       %(prog)s 源目录 --archive 归档文件 [后缀名...] [选项]
+       %(prog)s --run-plan 计划文件 [选项]
+       %(prog)s --jobs 作业文件 [选项]
 
 位置参数:
   源目录            要处理的源目录路径
-  目标目录          文件复制/移动的目标目录路径
+  目标目录          文件复制/移动的目标目录路径（使用 --archive 时省略）
   后缀名            要处理的文件后缀名列表（例如：txt pdf）
 
 选项:
@@ -184,11 +1648,69 @@ def main():
                    文件名包含的关键字（不含扩展名）
   -e EXCLUDE, --exclude EXCLUDE
                    要排除的文件名关键字（不含扩展名）
+  --glob PATTERN [PATTERN ...]
+                   文件名通配符规则（不区分大小写，匹配其一即可）
+  --regex PATTERN [PATTERN ...]
+                   文件名正则表达式规则（匹配其一即可）
+  --exclude-dir PATTERN [PATTERN ...]
+                   遍历时跳过的目录（通配符，如 .git node_modules *cache*；
+                   含 / 时匹配相对源目录的路径），对 -l 同样有效
+  --max-depth N    最大遍历深度，0 表示只处理源目录下的文件
   -x, --move       使用移动而不是复制
   -k, --keep       保留原有的文件夹结构（默认不保留）
+  --precreate-dirs 与 -k 一起使用：扫描结束后先按顺序一次性创建全部目标目录，
+                   再开始复制
+  --on-collision {suffix,parent,overwrite,newest,largest}
+                   平铺模式下同名文件的处理方式：suffix 追加编号（默认），
+                   parent 加上所在文件夹名称，overwrite 保留最后扫描到的文件，
+                   newest/largest 保留最新/最大的文件
+  -w WORKERS, --workers WORKERS
+                   并发处理的线程数（默认 1；与 -l 一起使用时为同时
+                   枚举目录的线程数，默认 8）
+  --copy-method {auto,reflink,kernel,userspace}
+                   复制方式：auto 依次尝试 reflink、copy_file_range、
+                   sendfile 和用户态复制；reflink 仅克隆；kernel 仅使用
+                   内核复制；userspace 仅用户态读写（默认 auto）
+  --large-file-threshold SIZE
+                   不小于该大小的文件（如 1G）预分配目标空间后由多个线程
+                   分块并行复制，适合高带宽存储上的单个超大文件（默认不启用）
+  --chunk-size SIZE
+                   分块并行复制时每块的大小（默认 64M）
+  --chunk-workers N
+                   分块并行复制单个文件的线程数（默认 4）
+  --archive FILE   不复制到目标目录，而是把匹配的文件以流的方式直接写入归档
+                   （.tar、.tar.gz、.tar.bz2、.tar.xz、.tar.zst 或 .zip），
+                   -k 和 --on-collision 决定归档中的路径，日志保存在归档所在目录；
+                   .tar.zst 需要安装 zstandard
+  --sync           增量同步：跳过目标中大小和修改时间一致的文件，
+                   并记录可续传的操作日志
+  --verify         复制时在同一次读取中计算 BLAKE2b 摘要，写完后绕过页缓存读回
+                   目标文件校验，摘要写入日志；跨磁盘移动只有校验通过才删除源文件
+  --dedup {skip,link}
+                   内容去重：skip 跳过重复文件，link 在目标中创建硬链接，
+                   并在目标目录中生成重复文件报告
+  --dry-run        只生成并显示执行计划（操作列表、总大小、需要新建的目录数
+                   和目标磁盘空间检查），不复制或移动任何文件
+  --save-plan FILE 生成执行计划并保存到文件（不执行），供审阅后用 --run-plan 执行
+  --run-plan FILE  执行保存的计划，不再扫描源目录（可与 -w、--copy-method、
+                   --sync、--verify、-q、--log-format 一起使用）
+  --jobs FILE      批量执行作业文件（JSON 或 .toml）中列出的多组源目录和目标目录，
+                   各任务并发执行，-w 为所有任务共用的线程总数（默认取作业文件中的
+                   workers，否则为 8）；-x、-k、--sync、--verify、--copy-method、
+                   --on-collision 和 --log-format 作为各任务的默认值
+  -q, --quiet      不在控制台逐个输出处理的文件（错误和汇总仍会输出）
+  --profile [N]    性能分析：统计各阶段耗时、按文件大小分档的耗时分布和最慢的
+                   N 个文件（默认 10），结束时输出并在目标目录中保存报告
+  --log-format {text,jsonl}
+                   日志格式：text 为文本日志，jsonl 为每行一条 JSON 的
+                   结构化日志（含操作、源、目标、字节数、耗时和错误）
   -g, --gui        启动图形用户界面
   -l LIST, --list LIST
-                   分析指定目录中的文件类型及其数量"""
+                   分析指定目录中的文件类型、数量、总大小和最大的文件
+  --index DB       使用 SQLite 扫描索引文件（不存在时自动创建）：再次扫描时
+                   只重新列出修改时间变化的目录，对 -l 同样有效
+  --format {text,json,csv}
+                   -l 的输出格式：text 为表格，json/csv 便于脚本处理（默认 text）"""
     
     parser = argparse.ArgumentParser(description='文件复制/剪切工具', usage=usage, formatter_class=argparse.RawTextHelpFormatter)
     parser.add_argument('source', nargs='?', help='源目录路径')
@@ -196,17 +1718,57 @@ def main():
     parser.add_argument('extensions', nargs='*', help='要处理的文件后缀名列表')
     parser.add_argument('-i', '--include', nargs='+', help='文件名包含的关键字（不含扩展名）')
     parser.add_argument('-e', '--exclude', nargs='+', help='要排除的文件名关键字（不含扩展名）')
+    parser.add_argument('--glob', nargs='+', help='文件名通配符规则（不区分大小写）')
+    parser.add_argument('--regex', nargs='+', help='文件名正则表达式规则')
+    parser.add_argument('--exclude-dir', nargs='+', help='遍历时跳过的目录（通配符）')
+    parser.add_argument('--max-depth', type=int, help='最大遍历深度')
     parser.add_argument('-x', '--move', action='store_true', help='使用移动而不是复制')
     parser.add_argument('-k', '--keep', action='store_true', help='保留原有的文件夹结构（默认不保留）')
+    parser.add_argument('--precreate-dirs', action='store_true', help='保留结构时先一次性创建全部目标目录')
+    parser.add_argument('--on-collision', choices=COLLISION_MODES, default='suffix', help='平铺模式下同名文件的处理方式（默认 suffix）')
+    parser.add_argument('-w', '--workers', type=int, help='并发处理的线程数（默认 1，-l 时默认 8）')
+    parser.add_argument('--copy-method', choices=copy_backend.COPY_METHODS, default='auto', help='复制方式（默认 auto）')
+    parser.add_argument('--large-file-threshold', type=parse_size, metavar='SIZE', help='分块并行复制的最小文件大小')
+    parser.add_argument('--chunk-size', type=parse_size, default=copy_backend.DEFAULT_CHUNK_SIZE, metavar='SIZE', help='分块并行复制的块大小（默认 64M）')
+    parser.add_argument('--chunk-workers', type=int, default=copy_backend.DEFAULT_CHUNK_WORKERS, metavar='N', help='分块并行复制单个文件的线程数（默认 4）')
+    parser.add_argument('--archive', metavar='FILE', help='把匹配的文件直接写入 tar/zip 归档')
+    parser.add_argument('--sync', action='store_true', help='增量同步，跳过未变化的文件并支持中断续传')
+    parser.add_argument('--verify', action='store_true', help='复制时计算摘要并读回目标文件校验')
+    parser.add_argument('--dedup', choices=DEDUP_MODES, help='内容去重方式：skip 跳过重复文件，link 创建硬链接')
+    parser.add_argument('--dry-run', action='store_true', help='只生成并显示执行计划')
+    parser.add_argument('--save-plan', help='生成执行计划并保存到文件')
+    parser.add_argument('--run-plan', help='执行保存的计划文件')
+    parser.add_argument('--jobs', metavar='FILE', help='批量执行作业文件中的多个任务')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不在控制台逐个输出处理的文件')
+    parser.add_argument('--profile', type=int, nargs='?', const=DEFAULT_SLOWEST, metavar='N', help='性能分析，列出最慢的 N 个文件')
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='text', help='日志格式（默认 text）')
     parser.add_argument('-g', '--gui', action='store_true', help='启动图形用户界面')
     parser.add_argument('-l', '--list', help='分析指定目录中的文件类型及其数量')
+    parser.add_argument('--index', help='SQLite 扫描索引文件路径')
+    parser.add_argument('--format', choices=ANALYZE_FORMATS, default='text', help='-l 的输出格式（默认 text）')
     
     # 解析命令行参数
-    args = parser.parse_args()
+    # 允许选项与位置参数交错（如 源目录 --archive 归档文件 后缀名...）
+    args = parser.parse_intermixed_args()
+    
+    if args.max_depth is not None and args.max_depth < 0:
+        print("错误：最大遍历深度不能小于 0", file=sys.stderr)
+        sys.exit(1)
+    dir_filter = None
+    if args.exclude_dir or args.max_depth is not None:
+        dir_filter = DirFilter(args.exclude_dir, args.max_depth)
+    
+    if args.workers is not None and args.workers < 1:
+        print("错误：线程数必须大于等于 1", file=sys.stderr)
+        sys.exit(1)
     
     # 如果指定了-l参数，只执行文件分析
     if args.list:
-        analyze_file_types(args.list)
+        scan_index = open_scan_index(args.index)
+        try:
+            analyze_file_types(args.list, dir_filter, args.workers or ANALYZE_WORKERS, args.format, scan_index)
+        finally:
+            close_scan_index(scan_index)
         return
     
     # 检查是否启动GUI
@@ -223,7 +1785,71 @@ def main():
             print(f"启动GUI时发生错误: {str(e)}", file=sys.stderr)
             sys.exit(1)
     
+    if args.profile is not None and args.profile < 0:
+        print("错误：--profile 的文件数不能小于 0", file=sys.stderr)
+        sys.exit(1)
+    profiler = JobProfiler(args.profile) if args.profile is not None else None
+    
+    if args.chunk_size < 1 or args.chunk_workers < 1:
+        print("错误：--chunk-size 和 --chunk-workers 必须大于 0", file=sys.stderr)
+        sys.exit(1)
+    parallel = None
+    if args.large_file_threshold is not None:
+        parallel = copy_backend.ParallelCopy(args.large_file_threshold, args.chunk_size, args.chunk_workers)
+    
+    # 执行保存的计划
+    if args.run_plan:
+        try:
+            plan = load_plan(args.run_plan)
+        except (OSError, ValueError) as e:
+            print(f"错误：无法读取执行计划: {e}", file=sys.stderr)
+            sys.exit(1)
+        check_dependencies()
+        control = JobControl()
+        cancel_on_interrupt(control)
+        summary = execute_plan(plan, args.workers or 1, args.copy_method, args.sync, quiet=args.quiet,
+                               log_format=args.log_format, profiler=profiler, precreate_dirs=args.precreate_dirs,
+                               parallel=parallel, verify=args.verify, control=control)
+        if summary and summary['cancelled']:
+            sys.exit(130)
+        return
+    
+    # 批量执行作业文件：所有任务在同一个进程中并发执行
+    if args.jobs:
+        from batch_jobs import load_job_file, run_batch, print_batch_summary, DEFAULT_BATCH_WORKERS
+        defaults = {'move': args.move, 'keep': args.keep, 'sync': args.sync, 'verify': args.verify,
+                    'copy_method': args.copy_method, 'on_collision': args.on_collision,
+                    'log_format': args.log_format}
+        try:
+            tasks, file_workers = load_job_file(args.jobs, defaults)
+        except (OSError, ValueError) as e:
+            print(f"错误：无法读取作业文件: {e}", file=sys.stderr)
+            sys.exit(1)
+        check_dependencies()
+        control = JobControl()
+        cancel_on_interrupt(control)
+        summary = run_batch(tasks, args.workers or file_workers or DEFAULT_BATCH_WORKERS, args.quiet,
+                            parallel, args.index, control)
+        print_batch_summary(summary)
+        if summary['cancelled']:
+            sys.exit(130)
+        if summary['failed']:
+            sys.exit(1)
+        return
+    
     # 命令行模式
+    # 归档模式没有目标目录：第二个位置参数是第一个后缀名，日志保存在归档所在目录
+    if args.archive:
+        if args.destination is not None:
+            args.extensions.insert(0, args.destination)
+        args.destination = os.path.dirname(os.path.abspath(args.archive))
+        if args.move or args.sync or args.verify or args.dedup == 'link' or args.dry_run or args.save_plan:
+            print("错误：--archive 不能与 -x、--sync、--verify、--dedup link、--dry-run 或 --save-plan 一起使用", file=sys.stderr)
+            sys.exit(1)
+        if not args.archive.lower().endswith(tuple(ARCHIVE_FORMATS)):
+            print(f"错误：不支持的归档格式，支持 {', '.join(ARCHIVE_FORMATS)}", file=sys.stderr)
+            sys.exit(1)
+    
     # 检查必要参数
     if not args.source or not args.destination:
         parser.print_help()
@@ -237,19 +1863,67 @@ def main():
         print(f"错误：源目录 '{args.source}' 不存在", file=sys.stderr)
         sys.exit(1)
     
-    # 处理文件扩展名
-    extensions = [ext if ext.startswith('.') else f'.{ext}' for ext in args.extensions]
-    
-    # 执行文件处理
-    process_files(
-        args.source,
-        args.destination,
-        extensions,
-        args.include,
-        args.exclude,
-        args.move,
-        args.keep
-    )
+    # 处理文件扩展名并编译筛选规则
+    extensions = normalize_extensions(args.extensions)
+    try:
+        file_filter = FileFilter(extensions, args.include, args.exclude, args.glob, args.regex)
+    except re.error as e:
+        print(f"错误：无效的正则表达式: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    # 只生成执行计划
+    if args.dry_run or args.save_plan:
+        scan_index = open_scan_index(args.index)
+        try:
+            plan = build_plan(args.source, args.destination, extensions, args.include, args.exclude,
+                              args.move, args.keep, args.workers or 1, args.dedup, file_filter, dir_filter,
+                              scan_index, args.on_collision)
+        finally:
+            close_scan_index(scan_index)
+        print_plan(plan, args.quiet)
+        if args.save_plan:
+            save_plan(plan, args.save_plan)
+            print(f"执行计划已保存到: {args.save_plan}")
+        return
+    
+    # 执行文件处理（Ctrl-C 平稳地取消）
+    control = JobControl()
+    cancel_on_interrupt(control)
+    scan_index = open_scan_index(args.index)
+    try:
+        summary = process_files(
+            args.source,
+            args.destination,
+            extensions,
+            args.include,
+            args.exclude,
+            args.move,
+            args.keep,
+            workers=args.workers or 1,
+            copy_method=args.copy_method,
+            sync=args.sync,
+            dedup=args.dedup,
+            file_filter=file_filter,
+            dir_filter=dir_filter,
+            quiet=args.quiet,
+            log_format=args.log_format,
+            scan_index=scan_index,
+            on_collision=args.on_collision,
+            profiler=profiler,
+            precreate_dirs=args.precreate_dirs,
+            parallel=parallel,
+            archive=args.archive,
+            verify=args.verify,
+            control=control
+        )
+    except ValueError as e:
+        # 如缺少写入 .tar.zst 所需的 zstandard
+        print(f"错误：{e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        close_scan_index(scan_index)
+    if summary and summary['cancelled']:
+        sys.exit(130)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+文件筛选模块
+把扩展名、包含/排除关键词以及通配符、正则规则编译为一个筛选器对象，
+每个作业只构建一次，之后对每个文件名的判断不再重复解析规则
+"""
+import os
+import re
+import fnmatch
+from collections import deque
+
+class KeywordMatcher:
+    """多关键词子串匹配
+
+    关键词较少时直接使用 str 的子串查找（C 实现，常数更小）；
+    关键词数量达到 AUTOMATON_THRESHOLD 后构建 Aho-Corasick 自动机，
+    对每个文件名只扫描一遍，耗时与关键词数量无关。
+    """
+
+    AUTOMATON_THRESHOLD = 16
+
+    def __init__(self, keywords):
+        keywords = list(dict.fromkeys(keywords))
+        self.keywords = tuple(keywords)
+        # 空关键词可以匹配任何字符串
+        self._match_all = '' in keywords
+        keywords = [k for k in keywords if k]
+        if len(keywords) >= self.AUTOMATON_THRESHOLD:
+            self._build_automaton(keywords)
+            self.search = self._search_automaton
+        else:
+            self._simple = tuple(keywords)
+            self.search = self._search_simple
+
+    def _build_automaton(self, keywords):
+        """构建 goto/fail 表以及每个状态是否对应某个关键词的结尾"""
+        goto = [{}]
+        output = [False]
+        for keyword in keywords:
+            state = 0
+            for ch in keyword:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    output.append(False)
+                state = next_state
+            output[state] = True
+
+        fail = [0] * len(goto)
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, next_state in goto[state].items():
+                pending.append(next_state)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[next_state] = goto[f].get(ch, 0)
+                # 后缀是关键词时当前状态也算匹配
+                output[next_state] = output[next_state] or output[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def _search_simple(self, text):
+        if self._match_all:
+            return True
+        for keyword in self._simple:
+            if keyword in text:
+                return True
+        return False
+
+    def _search_automaton(self, text):
+        if self._match_all:
+            return True
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                return True
+        return False
+
+def normalize_extensions(extensions):
+    """统一扩展名格式：补全开头的点号"""
+    return [ext if ext.startswith('.') else f'.{ext}' for ext in extensions or []]
+
+class FileFilter:
+    """编译后的文件名筛选器
+
+    - extensions：扩展名列表，不区分大小写，支持 .tar.gz 这类多段扩展名
+    - include_keywords / exclude_keywords：文件名（不含扩展名）中包含/排除的关键词
+    - globs：通配符规则（如 IMG_*.jpg），不区分大小写，设置后文件名需匹配其中之一
+    - regexes：正则表达式规则，设置后文件名需匹配（search）其中之一
+    """
+
+    def __init__(self, extensions=None, include_keywords=None, exclude_keywords=None, globs=None, regexes=None):
+        self.extensions = frozenset(ext.casefold() for ext in normalize_extensions(extensions))
+        self.include = KeywordMatcher(include_keywords) if include_keywords else None
+        self.exclude = KeywordMatcher(exclude_keywords) if exclude_keywords else None
+        patterns = [fnmatch.translate(g) for g in globs or []]
+        self.glob = re.compile('|'.join(patterns), re.IGNORECASE) if patterns else None
+        self.regexes = tuple(re.compile(r) for r in regexes or [])
+
+    def _match_extension(self, filename):
+        """依次检查从每个点号开始的后缀，命中集合即可"""
+        name = filename.casefold()
+        index = name.find('.')
+        while index != -1:
+            if name[index:] in self.extensions:
+                return True
+            index = name.find('.', index + 1)
+        return False
+
+    def match(self, filename):
+        """判断文件名是否符合所有筛选条件"""
+        if self.extensions and not self._match_extension(filename):
+            return False
+
+        if self.include or self.exclude:
+            name_without_ext = os.path.splitext(filename)[0]
+            if self.exclude and self.exclude.search(name_without_ext):
+                return False
+            if self.include and not self.include.search(name_without_ext):
+                return False
+
+        if self.glob and not self.glob.match(filename):
+            return False
+
+        if self.regexes and not any(r.search(filename) for r in self.regexes):
+            return False
+
+        return True
+
+    __call__ = match
+
+class DirFilter:
+    """目录剪枝规则，在遍历时直接跳过被排除的子树
+
+    - exclude_dirs：目录通配符规则（不区分大小写）。不含 / 的规则匹配目录名，
+      如 .git、node_modules、*cache*；含 / 的规则匹配相对源目录的路径，如 build/tmp
+    - max_depth：最大遍历深度，0 表示只处理源目录下的文件，1 表示再进入一层子目录
+    """
+
+    def __init__(self, exclude_dirs=None, max_depth=None):
+        name_patterns = [fnmatch.translate(p) for p in exclude_dirs or [] if '/' not in p.replace('\\', '/')]
+        path_patterns = [fnmatch.translate(p.replace('\\', '/').strip('/'))
+                         for p in exclude_dirs or [] if '/' in p.replace('\\', '/')]
+        self.name_pattern = re.compile('|'.join(name_patterns), re.IGNORECASE) if name_patterns else None
+        self.path_pattern = re.compile('|'.join(path_patterns), re.IGNORECASE) if path_patterns else None
+        self.max_depth = max_depth
+
+    def allow(self, name, depth, rel_path=None):
+        """判断深度为 depth（源目录的直接子目录为 1）的目录是否需要遍历"""
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if self.name_pattern and self.name_pattern.match(name):
+            return False
+        if self.path_pattern and rel_path is not None and self.path_pattern.match(rel_path.replace(os.sep, '/')):
+            return False
+        return True
+
+    @property
+    def needs_rel_path(self):
+        return self.path_pattern is not None
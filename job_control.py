@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+作业控制
+协作式的暂停、继续和取消：界面线程或信号处理函数调用 pause/resume/cancel，
+处理线程在文件之间和复制的数据块之间调用 checkpoint。暂停时 checkpoint 阻塞到继续或取消为止，
+取消后抛出 JobCancelled，由处理代码删除写了一半的目标文件。
+"""
+import threading
+
+class JobCancelled(Exception):
+    """作业已被取消（由 JobControl.checkpoint 抛出）"""
+
+class JobControl:
+    """一个作业的暂停和取消标记，可以在任意线程中调用"""
+
+    def __init__(self):
+        # 设置时表示运行中，清除时表示已暂停
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        # 唤醒暂停中的线程，让它们看到取消标记
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait(self, timeout=None):
+        """暂停时最多等待 timeout 秒，返回是否已恢复运行（或已取消）"""
+        return self._running.wait(timeout)
+
+    def checkpoint(self):
+        """暂停时阻塞直到继续或取消；已取消时抛出 JobCancelled"""
+        if not self._running.is_set():
+            self._running.wait()
+        if self._cancelled.is_set():
+            raise JobCancelled("作业已取消")
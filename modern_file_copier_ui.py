@@ -1,12 +1,11 @@
 #!/usr/bin/env python3
-import os
-import sys
 import customtkinter as ctk
-from tkinter import filedialog, messagebox
-from file_copier import process_files, check_dependencies, analyze_file_types
+from tkinter import messagebox
+from file_copier import check_dependencies
 from modern_icons import get_icon
+from ui_worker import FileCopierController, OUTPUT_MAX_LINES
 
-class ModernFileCopierUI:
+class ModernFileCopierUI(FileCopierController):
     def __init__(self):
         # 设置 CustomTkinter 外观
         ctk.set_appearance_mode("system")  # 跟随系统主题
@@ -59,8 +58,8 @@ class ModernFileCopierUI:
         browse_btn = ctk.CTkButton(source_frame, text="浏览", command=self.browse_source, width=80, image=get_icon("folder", size=(16, 16)), compound="left")
         browse_btn.grid(row=0, column=2, padx=(0, 15), pady=15)
 
-        scan_btn = ctk.CTkButton(source_frame, text="扫描", command=self.scan_source, width=80, image=get_icon("search", size=(16, 16)), compound="left")
-        scan_btn.grid(row=0, column=3, padx=(0, 15), pady=15)
+        self.scan_btn = ctk.CTkButton(source_frame, text="扫描", command=self.scan_source, width=80, image=get_icon("search", size=(16, 16)), compound="left")
+        self.scan_btn.grid(row=0, column=3, padx=(0, 15), pady=15)
 
         # 目标目录框架
         dest_frame = ctk.CTkFrame(self.root)
@@ -94,6 +93,20 @@ class ModernFileCopierUI:
         self.log_enabled_var = ctk.BooleanVar(value=True)
         ctk.CTkCheckBox(options_frame, text="记录日志", variable=self.log_enabled_var).grid(row=0, column=3, padx=15, pady=15, sticky="w")
 
+        # 并发线程数
+        ctk.CTkLabel(options_frame, text="并发线程数:", font=ctk.CTkFont(size=14, weight="bold")).grid(row=1, column=0, padx=15, pady=(0, 15), sticky="w")
+        self.workers_var = ctk.StringVar(value="4")
+        workers_combo = ctk.CTkComboBox(options_frame, values=["1", "2", "4", "8", "16", "32"], variable=self.workers_var, width=120)
+        workers_combo.grid(row=1, column=1, padx=15, pady=(0, 15), sticky="w")
+
+        # 性能分析
+        self.profile_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(options_frame, text="性能分析", variable=self.profile_var).grid(row=1, column=2, padx=15, pady=(0, 15), sticky="w")
+
+        # 勾选时执行前先生成执行计划并在确认对话框中显示（需要等待扫描结束，内存占用随文件数增长）
+        self.preview_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(options_frame, text="预览执行计划", variable=self.preview_var).grid(row=1, column=3, padx=15, pady=(0, 15), sticky="w")
+
         # 颜色主题选择功能已移除
 
         # 外观模式切换
@@ -136,20 +149,27 @@ class ModernFileCopierUI:
         # 输出显示区域
         output_frame = ctk.CTkFrame(self.root)
         output_frame.grid(row=6, column=0, columnspan=2, padx=20, pady=(10, 20), sticky="nsew")
-        output_frame.grid_rowconfigure(0, weight=1)
+        output_frame.grid_rowconfigure(1, weight=1)
         output_frame.grid_columnconfigure(0, weight=1)
 
-        ctk.CTkLabel(output_frame, text="输出信息:", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, padx=15, pady=(15, 5), sticky="w")
+        ctk.CTkLabel(output_frame, text=f"输出信息（最近 {OUTPUT_MAX_LINES} 行，完整记录见日志）:", font=ctk.CTkFont(size=14, weight="bold")).grid(row=0, column=0, padx=15, pady=(15, 5), sticky="w")
+        ctk.CTkButton(output_frame, text="在文件中查看", command=self.show_log, width=110).grid(row=0, column=1, padx=15, pady=(15, 5), sticky="e")
 
         self.output_text = ctk.CTkTextbox(output_frame, font=ctk.CTkFont(family="Consolas", size=11))
-        self.output_text.grid(row=1, column=0, padx=15, pady=(0, 15), sticky="nsew")
+        self.output_text.grid(row=1, column=0, columnspan=2, padx=15, pady=(0, 10), sticky="nsew")
+
+        # 错误信息区域：只显示错误，不会被大量的正常输出挤掉
+        self.error_label_var = ctk.StringVar(value="错误信息:")
+        ctk.CTkLabel(output_frame, textvariable=self.error_label_var, font=ctk.CTkFont(size=14, weight="bold")).grid(row=2, column=0, padx=15, pady=(0, 5), sticky="w")
+        self.error_text = ctk.CTkTextbox(output_frame, height=90, text_color="red", font=ctk.CTkFont(family="Consolas", size=11))
+        self.error_text.grid(row=3, column=0, columnspan=2, padx=15, pady=(0, 15), sticky="ew")
 
         # 按钮框架
         button_frame = ctk.CTkFrame(self.root)
         button_frame.grid(row=7, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="ew")
-        button_frame.grid_columnconfigure((0, 1, 2), weight=1)
+        button_frame.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
 
-        execute_btn = ctk.CTkButton(
+        self.execute_btn = ctk.CTkButton(
             button_frame,
             text="执行操作",
             command=self.execute,
@@ -158,7 +178,26 @@ class ModernFileCopierUI:
             image=get_icon("play", size=(20, 20)),
             compound="left"
         )
-        execute_btn.grid(row=0, column=0, padx=15, pady=15, sticky="ew")
+        self.execute_btn.grid(row=0, column=0, padx=15, pady=15, sticky="ew")
+
+        # 暂停和取消按钮，仅在执行操作时可用
+        self.pause_btn = ctk.CTkButton(
+            button_frame,
+            text="暂停",
+            command=self.toggle_pause,
+            height=40,
+            state="disabled"
+        )
+        self.pause_btn.grid(row=0, column=1, padx=15, pady=15, sticky="ew")
+
+        self.cancel_btn = ctk.CTkButton(
+            button_frame,
+            text="取消",
+            command=self.cancel_job,
+            height=40,
+            state="disabled"
+        )
+        self.cancel_btn.grid(row=0, column=2, padx=15, pady=15, sticky="ew")
 
         clear_btn = ctk.CTkButton(
             button_frame,
@@ -168,7 +207,7 @@ class ModernFileCopierUI:
             image=get_icon("clear", size=(20, 20)),
             compound="left"
         )
-        clear_btn.grid(row=0, column=1, padx=15, pady=15, sticky="ew")
+        clear_btn.grid(row=0, column=3, padx=15, pady=15, sticky="ew")
 
         quit_btn = ctk.CTkButton(
             button_frame,
@@ -178,67 +217,28 @@ class ModernFileCopierUI:
             fg_color="darkred",
             hover_color="red"
         )
-        quit_btn.grid(row=0, column=2, padx=15, pady=15, sticky="ew")
+        quit_btn.grid(row=0, column=4, padx=15, pady=15, sticky="ew")
 
         # 状态栏
         self.status_var = ctk.StringVar(value="就绪")
         status_bar = ctk.CTkLabel(self.root, textvariable=self.status_var, font=ctk.CTkFont(size=12))
         status_bar.grid(row=8, column=0, columnspan=2, padx=20, pady=(0, 10), sticky="ew")
 
-    def browse_source(self):
-        """浏览选择源目录"""
-        directory = filedialog.askdirectory(title="选择源目录")
-        if directory:
-            self.source_entry.delete(0, "end")
-            self.source_entry.insert(0, directory)
-
-    def browse_dest(self):
-        """浏览选择目标目录"""
-        directory = filedialog.askdirectory(title="选择目标目录")
-        if directory:
-            self.dest_entry.delete(0, "end")
-            self.dest_entry.insert(0, directory)
-
-    def scan_source(self):
-        """扫描源目录中的文件类型"""
-        source_dir = self.source_entry.get().strip()
-
-        if not source_dir or not os.path.exists(source_dir):
-            messagebox.showerror("错误", "请选择有效的源目录")
-            return
-
-        # 清空输出区域
-        self.output_text.delete("0.0", "end")
-        self.status_var.set("正在扫描目录...")
-        self.root.update()
-
-        # 重定向标准输出到文本区域
-        class TextRedirector:
-            def __init__(self, text_widget):
-                self.text_widget = text_widget
-
-            def write(self, string):
-                self.text_widget.insert("end", string)
-                self.text_widget.see("end")
-
-            def flush(self):
-                pass
-
-        # 保存原始标准输出
-        original_stdout = sys.stdout
-        try:
-            # 重定向输出
-            sys.stdout = TextRedirector(self.output_text)
+    def set_busy(self, busy):
+        """作业运行期间禁用扫描和执行按钮"""
+        state = "disabled" if busy else "normal"
+        self.scan_btn.configure(state=state)
+        self.execute_btn.configure(state=state)
 
-            # 执行扫描
-            analyze_file_types(source_dir)
+    def set_control_buttons(self, enabled, pause_text="暂停"):
+        """启用或禁用暂停和取消按钮"""
+        state = "normal" if enabled else "disabled"
+        self.pause_btn.configure(text=pause_text, state=state)
+        self.cancel_btn.configure(state=state)
 
-        except Exception as e:
-            self.output_text.insert("end", f"\n扫描过程中发生错误: {str(e)}\n")
-        finally:
-            # 恢复原始标准输出
-            sys.stdout = original_stdout
-            self.status_var.set("扫描完成")
+    def set_progress(self, fraction):
+        """更新进度条（0~1）"""
+        self.progress_bar.set(fraction)
 
     def change_theme(self, selected_theme):
         """切换应用主题"""
@@ -262,126 +262,10 @@ class ModernFileCopierUI:
 
     def clear_output(self):
         """清空输出区域"""
-        self.output_text.delete("0.0", "end")
+        self.reset_output()
         self.progress_bar.set(0)
         self.status_var.set("输出已清空")
 
-    def execute(self):
-        """执行文件处理操作"""
-        source_dir = self.source_entry.get().strip()
-        dest_dir = self.dest_entry.get().strip()
-
-        # 验证输入
-        if not source_dir or not os.path.exists(source_dir):
-            messagebox.showerror("错误", "请选择有效的源目录")
-            return
-
-        if not dest_dir:
-            messagebox.showerror("错误", "请选择目标目录")
-            return
-
-        # 获取其他参数
-        is_move = self.operation_var.get() == "剪切"
-        keep_structure = self.keep_structure_var.get()
-        log_enabled = self.log_enabled_var.get()
-
-        # 处理文件后缀
-        extensions_text = self.extensions_entry.get().strip()
-        extensions = []
-        if extensions_text:
-            extensions = [ext if ext.startswith('.') else f'.{ext}' for ext in extensions_text.split()]
-
-        # 处理包含/排除关键词
-        include_text = self.include_entry.get().strip()
-        include_keywords = include_text.split() if include_text else None
-
-        exclude_text = self.exclude_entry.get().strip()
-        exclude_keywords = exclude_text.split() if exclude_text else None
-
-        # 确认操作
-        op_type = "移动" if is_move else "复制"
-        confirm_msg = f"确定要{op_type}文件吗？\n\n"
-        confirm_msg += f"源目录: {source_dir}\n"
-        confirm_msg += f"目标目录: {dest_dir}\n"
-        if extensions:
-            confirm_msg += f"文件后缀: {', '.join(extensions)}\n"
-        if include_keywords:
-            confirm_msg += f"包含关键词: {', '.join(include_keywords)}\n"
-        if exclude_keywords:
-            confirm_msg += f"排除关键词: {', '.join(exclude_keywords)}\n"
-        confirm_msg += f"保留文件夹结构: {'是' if keep_structure else '否'}\n"
-        confirm_msg += f"日志记录: {'启用' if log_enabled else '禁用'}\n"
-
-        if not messagebox.askyesno("确认操作", confirm_msg):
-            return
-
-        # 更新状态
-        self.status_var.set(f"正在{op_type}文件...")
-        self.progress_bar.set(0)
-        self.root.update()
-
-        # 清空输出区域
-        self.output_text.delete("0.0", "end")
-
-        # 重定向标准输出到文本区域
-        class TextRedirector:
-            def __init__(self, text_widget, progress_bar):
-                self.text_widget = text_widget
-                self.progress_bar = progress_bar
-                self.total_files = 0
-                self.processed_files = 0
-
-            def write(self, string):
-                self.text_widget.insert("end", string)
-                self.text_widget.see("end")
-                # 更新进度条（基于简单的启发式）
-                if "处理文件:" in string:
-                    self.processed_files += 1
-                    if self.total_files > 0:
-                        progress = min(self.processed_files / self.total_files, 1.0)
-                        self.progress_bar.set(progress)
-
-            def flush(self):
-                pass
-
-        # 保存原始标准输出
-        original_stdout = sys.stdout
-        original_stderr = sys.stderr
-
-        try:
-            # 重定向输出
-            redirector = TextRedirector(self.output_text, self.progress_bar)
-            sys.stdout = redirector
-            sys.stderr = redirector
-
-            # 执行文件处理
-            process_files(
-                source_dir,
-                dest_dir,
-                extensions,
-                include_keywords,
-                exclude_keywords,
-                is_move,
-                keep_structure,
-                log_enabled
-            )
-
-            # 完成进度条
-            self.progress_bar.set(1.0)
-            messagebox.showinfo("完成", f"文件{op_type}操作已完成")
-            self.status_var.set("操作完成")
-
-        except Exception as e:
-            error_msg = f"操作过程中发生错误: {str(e)}"
-            self.output_text.insert("end", f"\n{error_msg}\n")
-            messagebox.showerror("错误", error_msg)
-            self.status_var.set("发生错误")
-
-        finally:
-            # 恢复原始标准输出
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
-
     def quit_app(self):
         """退出应用程序"""
         if messagebox.askyesno("确认退出", "确定要退出文件复制工具吗？"):
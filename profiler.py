@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+作业性能分析
+按阶段累计耗时（遍历、筛选、创建目录、复制、日志输出等），按文件大小分档统计
+单个文件的处理耗时分布，并记录最慢的若干个文件。
+未启用时使用 NULL_PROFILER，各个埋点只是空操作，对处理速度几乎没有影响。
+"""
+import json
+import time
+import heapq
+import bisect
+import threading
+import contextlib
+
+from progress import format_size
+
+# 文件大小分档的上界（字节）及名称，最后一档没有上界
+SIZE_BUCKETS = (4 * 1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024, 256 * 1024 * 1024)
+SIZE_BUCKET_NAMES = ('<4KB', '4KB-64KB', '64KB-1MB', '1MB-16MB', '16MB-256MB', '>=256MB')
+
+# 单个文件耗时分档的上界（秒）及名称
+LATENCY_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+LATENCY_BUCKET_NAMES = ('<1ms', '1-10ms', '10-100ms', '100ms-1s', '1-10s', '>=10s')
+
+# 默认记录的最慢文件数
+DEFAULT_SLOWEST = 10
+
+# 阶段的显示名称
+PHASE_NAMES = {
+    'scan': '遍历目录（含筛选）',
+    'filter': '文件名筛选',
+    'collisions': '同名文件处理',
+    'dedup': '内容去重',
+    'sync': '同步比较',
+    'makedirs': '创建目录',
+    'copy': '复制/移动',
+    'log': '日志与控制台输出',
+    'progress': '进度刷新',
+}
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+class NullProfiler:
+    """未启用性能分析时使用的空实现"""
+
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_CONTEXT
+
+    def add(self, name, seconds):
+        pass
+
+    def record_file(self, path, size, seconds):
+        pass
+
+    def report(self):
+        return None
+
+NULL_PROFILER = NullProfiler()
+
+class _Phase:
+    """累计一个阶段耗时的上下文管理器"""
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class JobProfiler:
+    """线程安全的作业性能分析器
+
+    - phase(name) 返回上下文管理器，累计该阶段的耗时和调用次数
+    - record_file 记录单个文件的处理耗时，用于大小分档的耗时分布和最慢文件列表
+    - report 返回 JSON 可序列化的报告
+
+    工作线程中的阶段耗时按所有线程累加，多线程时可能超过作业的实际耗时。
+    """
+
+    enabled = True
+
+    def __init__(self, slowest=DEFAULT_SLOWEST):
+        self.slowest = slowest
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._histogram = [[0] * len(LATENCY_BUCKET_NAMES) for _ in SIZE_BUCKET_NAMES]
+        self._bucket_totals = [[0, 0, 0.0] for _ in SIZE_BUCKET_NAMES]
+        self._slowest = []
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def add(self, name, seconds):
+        with self._lock:
+            stats = self._phases.get(name)
+            if stats is None:
+                stats = self._phases[name] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+
+    def wrap(self, name, func):
+        """返回把每次调用计入 name 阶段的函数"""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+        return timed
+
+    def timed_iter(self, name, iterable):
+        """逐个取出元素，把每次取元素的耗时计入 name 阶段"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - start)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def record_file(self, path, size, seconds):
+        size_index = bisect.bisect_right(SIZE_BUCKETS, size)
+        latency_index = bisect.bisect_right(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self._histogram[size_index][latency_index] += 1
+            totals = self._bucket_totals[size_index]
+            totals[0] += 1
+            totals[1] += size
+            totals[2] += seconds
+            entry = (seconds, size, path)
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, entry)
+            elif self.slowest and entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def report(self):
+        """返回性能分析报告字典"""
+        with self._lock:
+            phases = {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                      for name, (calls, seconds) in sorted(self._phases.items(), key=lambda x: -x[1][1])}
+            buckets = []
+            for index, name in enumerate(SIZE_BUCKET_NAMES):
+                files, num_bytes, seconds = self._bucket_totals[index]
+                if not files:
+                    continue
+                buckets.append({
+                    'size': name,
+                    'files': files,
+                    'bytes': num_bytes,
+                    'seconds': round(seconds, 6),
+                    'avg_ms': round(seconds / files * 1000, 3),
+                    'latency': dict(zip(LATENCY_BUCKET_NAMES, self._histogram[index])),
+                })
+            slowest = [{'path': path, 'size': size, 'seconds': round(seconds, 6)}
+                       for seconds, size, path in sorted(self._slowest, reverse=True)]
+        return {
+            'elapsed': round(time.perf_counter() - self.start_time, 6),
+            'phases': phases,
+            'size_buckets': buckets,
+            'slowest': slowest,
+        }
+
+def format_report(report):
+    """把性能分析报告格式化为多行文本"""
+    lines = [f"\n性能分析（总耗时 {report['elapsed']:.2f} 秒，工作线程中的阶段耗时按线程累加）:"]
+    lines.append("-" * 60)
+    for name, stats in report['phases'].items():
+        lines.append(f"{PHASE_NAMES.get(name, name):<20} {stats['seconds']:>10.3f} 秒 {stats['calls']:>10} 次")
+    if report['size_buckets']:
+        lines.append("-" * 60)
+        lines.append("按文件大小分档的处理耗时:")
+        for bucket in report['size_buckets']:
+            distribution = ", ".join(f"{k}: {v}" for k, v in bucket['latency'].items() if v)
+            lines.append(f"  {bucket['size']:<12} {bucket['files']:>8} 个, 平均 {bucket['avg_ms']:.2f} 毫秒 ({distribution})")
+    if report['slowest']:
+        lines.append("-" * 60)
+        lines.append("最慢的文件:")
+        for item in report['slowest']:
+            lines.append(f"  {item['seconds']:.3f} 秒  {format_size(item['size']):>10}  {item['path']}")
+    lines.append("-" * 60)
+    return "\n".join(lines)
+
+def write_report(report, report_path):
+    """把性能分析报告保存为 JSON 文件"""
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+按字节统计的进度模型
+扫描阶段累加待处理的文件数和字节数，复制阶段按数据块累加已完成字节数，
+据此计算完成比例、实时速度（MB/s）和剩余时间，供命令行进度条和图形界面使用
+"""
+import time
+import threading
+from collections import deque
+
+# 计算实时速度时使用的时间窗口（秒）
+RATE_WINDOW = 5.0
+
+def format_size(num_bytes):
+    """将字节数格式化为易读的字符串"""
+    size = float(num_bytes)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
+
+# parse_size 可识别的单位
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+              'G': 1024 ** 3, 'GB': 1024 ** 3, 'T': 1024 ** 4, 'TB': 1024 ** 4}
+
+def parse_size(text):
+    """把 "512M"、"2GB"、"1048576" 这样的大小字符串解析为字节数，格式无效时抛出 ValueError"""
+    text = text.strip().upper()
+    number = text.rstrip('KMGTB')
+    unit = text[len(number):]
+    if unit not in SIZE_UNITS:
+        raise ValueError(f"无效的大小: {text}")
+    return int(float(number) * SIZE_UNITS[unit])
+
+def format_eta(seconds):
+    """把剩余秒数格式化为 时:分:秒 或 分:秒"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+class ProgressTracker:
+    """线程安全的字节进度统计
+
+    - 扫描线程调用 add_total 累加发现的文件
+    - 工作线程在复制过程中调用 advance 报告新写入的字节
+    - 单个文件结束时调用 finish_file 校正该文件的字节数
+    - 任意线程调用 snapshot 获取当前进度
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.total_files = 0
+        self.total_bytes = 0
+        self.done_files = 0
+        self.done_bytes = 0
+        self.scan_done = False
+        self._samples = deque([(self.start_time, 0)])
+
+    def add_total(self, size, files=1):
+        """扫描阶段发现新的待处理项目"""
+        with self._lock:
+            self.total_files += files
+            self.total_bytes += size
+
+    def set_scan_done(self):
+        """扫描结束，总数不再增加"""
+        self.scan_done = True
+
+    def advance(self, num_bytes):
+        """复制过程中报告新完成的字节数"""
+        with self._lock:
+            self.done_bytes += num_bytes
+
+    def finish_file(self, size, reported=0, transferred=True, files=1):
+        """一个项目处理结束
+
+        reported 为该项目已通过 advance 报告的字节数。transferred 为 True 时把
+        已完成字节数校正为 size（如重命名这类没有分块报告的操作）；为 False 时
+        （跳过、失败、硬链接）撤销已报告的字节，并把 size 从总量中扣除，使剩余时间只反映
+        真正需要传输的数据。
+        """
+        with self._lock:
+            self.done_files += files
+            if transferred:
+                self.done_bytes += size - reported
+            else:
+                self.done_bytes -= reported
+                self.total_bytes -= size
+
+    def snapshot(self):
+        """返回当前进度的字典副本"""
+        now = time.monotonic()
+        with self._lock:
+            done_bytes = self.done_bytes
+            total_bytes = self.total_bytes
+            done_files = self.done_files
+            total_files = self.total_files
+            samples = self._samples
+            samples.append((now, done_bytes))
+            while len(samples) > 2 and now - samples[0][0] > RATE_WINDOW:
+                samples.popleft()
+            window_start, window_bytes = samples[0]
+
+        elapsed = now - self.start_time
+        window = now - window_start
+        rate = (done_bytes - window_bytes) / window if window > 0 else 0.0
+        remaining = max(total_bytes - done_bytes, 0)
+        eta = remaining / rate if rate > 0 else None
+        if total_bytes > 0:
+            fraction = min(done_bytes / total_bytes, 1.0)
+        elif total_files > 0:
+            fraction = min(done_files / total_files, 1.0)
+        else:
+            fraction = 0.0
+        return {
+            'done_files': done_files,
+            'total_files': total_files,
+            'done_bytes': done_bytes,
+            'total_bytes': total_bytes,
+            'fraction': fraction,
+            'rate': rate,
+            'eta': eta,
+            'elapsed': elapsed,
+            'scan_done': self.scan_done,
+        }
+
+def format_progress(snapshot):
+    """把进度快照格式化为状态栏文本"""
+    text = (f"{snapshot['done_files']}/{snapshot['total_files']} 个文件, "
+            f"{format_size(snapshot['done_bytes'])}/{format_size(snapshot['total_bytes'])}, "
+            f"{format_size(snapshot['rate'])}/秒")
+    if snapshot['scan_done']:
+        text += f", 剩余 {format_eta(snapshot['eta'])}"
+    else:
+        text += ", 正在扫描..."
+    return text
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+持久化的扫描索引
+在 SQLite 数据库中保存每个目录下文件的名称、大小、修改时间和扩展名。
+再次扫描同一源目录时只对目录执行一次 stat，修改时间未变化的目录直接使用索引中的列表，
+只有新增、删除或重命名过条目的目录才会被重新列出。
+
+注意：在原处修改文件内容不会改变所在目录的修改时间，此类文件在索引中的大小和修改时间
+可能是旧值。因此复制、移动和生成计划时会对匹配的文件重新 stat（见 file_copier.restat_files），
+增量同步和日志使用的是文件的当前状态；只有文件类型分析（-l）直接使用索引中的数据。
+"""
+import os
+import time
+import sqlite3
+
+# 目录修改时间距列出时间不足该秒数时不信任该时间戳（文件系统时间戳精度有限，
+# 同一时刻内的后续修改可能不会改变目录的修改时间），下次扫描时重新列出
+RACY_WINDOW = 2.0
+
+# 每列出多少个目录提交一次事务
+COMMIT_INTERVAL = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ext TEXT NOT NULL,
+    PRIMARY KEY (dir, name)
+) WITHOUT ROWID;
+"""
+
+def _extension(name):
+    return os.path.splitext(name)[1].lower()
+
+class ScanIndex:
+    """基于 SQLite 的目录扫描索引
+
+    同一个数据库可以保存多个源目录，目录以绝对路径为键。
+    一个 ScanIndex 对象同一时间只应被一个扫描使用；多个作业可以各自打开同一个数据库文件。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        # 最近一次扫描中重新列出的目录数和直接使用索引的目录数
+        self.listed_dirs = 0
+        self.reused_dirs = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def iter_files(self, source_dir, name_filter=None, skip_dirs=None, dir_filter=None):
+        """与 file_copier.iter_files 相同的遍历规则，产出 (路径, 大小, 修改时间) 元组
+
+        遍历过程中顺带更新索引：修改时间变化的目录会被重新列出并写回数据库。
+        name_filter、skip_dirs、dir_filter 的含义与 iter_files 相同，筛选在索引数据上完成，
+        不需要访问文件系统。
+        """
+        self.listed_dirs = 0
+        self.reused_dirs = 0
+        skip_dirs = {os.path.normcase(os.path.abspath(d)) for d in skip_dirs} if skip_dirs else None
+        conn = self._conn
+        stack = [(source_dir, os.path.abspath(source_dir), 0)]
+        uncommitted = 0
+        try:
+            while stack:
+                current, key, depth = stack.pop()
+                try:
+                    st = os.stat(current)
+                except OSError:
+                    continue
+                row = conn.execute('SELECT mtime_ns FROM dirs WHERE path = ?', (key,)).fetchone()
+                if row is not None and row[0] == st.st_mtime_ns:
+                    files = conn.execute('SELECT name, size, mtime FROM files WHERE dir = ?', (key,)).fetchall()
+                    subdirs = [name for (name,) in conn.execute('SELECT name FROM dirs WHERE parent = ?', (key,))]
+                    self.reused_dirs += 1
+                else:
+                    listing = self._relist(current, key, st)
+                    if listing is None:
+                        continue
+                    files, subdirs = listing
+                    self.listed_dirs += 1
+                    uncommitted += 1
+                    if uncommitted >= COMMIT_INTERVAL:
+                        conn.commit()
+                        uncommitted = 0
+
+                for name, size, mtime in files:
+                    if name_filter is None or name_filter(name):
+                        yield os.path.join(current, name), size, mtime
+
+                children = []
+                for name in subdirs:
+                    child = os.path.join(current, name)
+                    if skip_dirs and os.path.normcase(os.path.abspath(child)) in skip_dirs:
+                        continue
+                    if dir_filter:
+                        rel_path = os.path.relpath(child, source_dir) if dir_filter.needs_rel_path else None
+                        if not dir_filter.allow(name, depth + 1, rel_path):
+                            continue
+                    children.append((child, os.path.join(key, name), depth + 1))
+                # 逆序入栈，保证按目录顺序深度优先遍历
+                stack.extend(reversed(children))
+        finally:
+            conn.commit()
+
+    def _relist(self, current, key, st):
+        """重新列出一个目录并写回索引，返回 (文件列表, 子目录名列表)；无法读取时返回 None"""
+        listed_at = time.time()
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # 与 os.walk 一致，不进入指向目录的符号链接
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                    try:
+                        entry_stat = entry.stat()
+                        files.append((entry.name, entry_stat.st_size, entry_stat.st_mtime))
+                    except OSError:
+                        # 无法获取信息的文件（如失效的链接）交给后续处理阶段报告错误
+                        files.append((entry.name, 0, 0.0))
+        except OSError:
+            return None
+
+        conn = self._conn
+        old_subdirs = {name for (name,) in conn.execute('SELECT name FROM dirs WHERE parent = ?', (key,))}
+        for name in old_subdirs.difference(subdirs):
+            self._forget(os.path.join(key, name))
+        conn.execute('DELETE FROM files WHERE dir = ?', (key,))
+        conn.executemany('INSERT INTO files (dir, name, size, mtime, ext) VALUES (?, ?, ?, ?, ?)',
+                         [(key, name, size, mtime, _extension(name)) for name, size, mtime in files])
+        # 新出现的子目录先以未知的修改时间登记，遍历到时再列出
+        conn.executemany('INSERT OR IGNORE INTO dirs (path, parent, name, mtime_ns) VALUES (?, ?, ?, NULL)',
+                         [(os.path.join(key, name), key, name) for name in subdirs])
+        mtime_ns = st.st_mtime_ns if listed_at - st.st_mtime >= RACY_WINDOW else None
+        conn.execute('INSERT INTO dirs (path, parent, name, mtime_ns) VALUES (?, ?, ?, ?) '
+                     'ON CONFLICT (path) DO UPDATE SET mtime_ns = excluded.mtime_ns',
+                     (key, os.path.dirname(key), os.path.basename(key), mtime_ns))
+        return files, subdirs
+
+    def _forget(self, key):
+        """从索引中删除已不存在的目录及其整个子树"""
+        # 子树中的路径都以 "目录/" 开头，按字符串范围删除可以利用主键索引
+        low = key + os.sep
+        high = key + chr(ord(os.sep) + 1)
+        self._conn.execute('DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)', (key, low, high))
+        self._conn.execute('DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)', (key, low, high))
@@ -0,0 +1,28 @@
+"""归档输出（--archive）的回归测试"""
+import os
+import tarfile
+
+from file_copier import process_files
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_archive_inside_source_keeps_sibling_files(tmp_path, capsys):
+    src = tmp_path / 'src'
+    _write(str(src / 'a.txt'), b'a')
+    _write(str(src / 'sub' / 'b.txt'), b'b')
+    _write(str(src / 'other' / 'c.txt'), b'c')
+    archive = src / 'sub' / 'out.tar'
+
+    summary = process_files(str(src), str(archive.parent), None, None, None, keep_structure=True,
+                            log_enabled=True, show_progress=False, quiet=True, archive=str(archive))
+    with tarfile.open(archive) as tar:
+        names = sorted(tar.getnames())
+    # 归档所在目录中的其他文件照常归档，归档自身和本次作业的日志不写入归档
+    assert names == ['a.txt', 'other/c.txt', 'sub/b.txt']
+    assert summary['files'] == 3
+    assert '归档完成: 3 个文件' in capsys.readouterr().out
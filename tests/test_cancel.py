@@ -0,0 +1,33 @@
+"""取消作业（JobControl）的回归测试"""
+import os
+
+import file_copier
+from file_copier import process_files
+from job_control import JobControl
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_cancel_skips_dedup_hashing(tmp_path, monkeypatch):
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    for index in range(20):
+        _write(str(src / f'd{index}' / 'same.txt'), b'duplicate content')
+    hashed = []
+    real_digest = file_copier.file_digest
+    monkeypatch.setattr(file_copier, 'file_digest',
+                        lambda *args, **kwargs: hashed.append(args[0]) or real_digest(*args, **kwargs))
+
+    control = JobControl()
+    control.cancel()
+    summary = process_files(str(src), str(dst), None, None, None, keep_structure=True, log_enabled=False,
+                            dedup='skip', precreate_dirs=True, show_progress=False, quiet=True,
+                            show_summary=False, control=control)
+    # 已取消的作业不再等待扫描结束，也不计算摘要、不写重复文件报告
+    assert summary['cancelled'] and summary['files'] == 0
+    assert hashed == []
+    assert not [name for name in os.listdir(dst) if name.endswith('_duplicates.json')]
@@ -0,0 +1,35 @@
+"""去重（--dedup）的回归测试"""
+import errno
+import os
+
+from file_copier import process_files
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_dedup_link_copies_when_hardlinks_are_unsupported(tmp_path, monkeypatch, capsys):
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    _write(str(src / 'a' / 'photo.jpg'), b'same bytes')
+    _write(str(src / 'b' / 'photo.jpg'), b'same bytes')
+
+    # 模拟 FAT/exFAT 等不支持硬链接的目标文件系统
+    def no_link(src_path, dst_path):
+        raise OSError(errno.EPERM, os.strerror(errno.EPERM))
+    monkeypatch.setattr(os, 'link', no_link)
+
+    summary = process_files(str(src), str(dst), None, None, None, keep_structure=True, log_enabled=True,
+                            dedup='link', show_progress=False, show_summary=False)
+    assert summary['errors'] == 0 and summary['files'] == 2
+    assert _read(dst / 'a' / 'photo.jpg') == b'same bytes'
+    assert _read(dst / 'b' / 'photo.jpg') == b'same bytes'
+    assert '已从保留副本复制' in capsys.readouterr().out
@@ -0,0 +1,31 @@
+"""执行计划（--save-plan / --run-plan）的回归测试"""
+import os
+
+from file_copier import build_plan, execute_plan, load_plan, save_plan
+
+
+def _write(path, data=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_saved_move_plan_ignores_files_added_later(tmp_path):
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    _write(str(src / 'a' / 'one.txt'))
+    _write(str(src / 'a' / 'b' / 'two.txt'))
+    _write(str(src / 'top.txt'))
+
+    plan = build_plan(str(src), str(dst), ['.txt'], is_move=True, keep_structure=True)
+    plan_path = str(tmp_path / 'plan.json')
+    save_plan(plan, plan_path)
+
+    # 生成计划后在本可整体移动的目录中加入不匹配的文件
+    _write(str(src / 'a' / 'keepme.docx'))
+
+    summary = execute_plan(load_plan(plan_path), log_enabled=False, show_progress=False, quiet=True)
+    assert summary['files'] == 3
+    assert os.path.exists(src / 'a' / 'keepme.docx')
+    assert not os.path.exists(dst / 'a' / 'keepme.docx')
+    assert os.path.exists(dst / 'a' / 'b' / 'two.txt')
@@ -0,0 +1,91 @@
+"""增量同步（--sync）的回归测试"""
+import os
+
+from file_copier import process_files
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _sync(src, dst, is_move=False):
+    return process_files(str(src), str(dst), None, None, None, is_move=is_move, keep_structure=True,
+                         log_enabled=False, sync=True, show_progress=False, quiet=True, show_summary=False)
+
+
+def test_sync_redoes_deleted_and_modified_destinations(tmp_path):
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    _write(str(src / 'top.txt'), b'top')
+    _write(str(src / 'a' / 'x.txt'), b'original x')
+    _write(str(src / 'a' / 'y.txt'), b'y')
+
+    summary = _sync(src, dst)
+    assert summary['files'] == 3
+
+    # 上次同步之后目标文件被删除或改动
+    os.remove(dst / 'top.txt')
+    _write(str(dst / 'a' / 'x.txt'), b'tampered!!')
+    os.utime(dst / 'a' / 'x.txt', (1000000000, 1000000000))
+
+    summary = _sync(src, dst)
+    assert summary['skipped'] == 1
+    assert _read(dst / 'top.txt') == b'top'
+    assert _read(dst / 'a' / 'x.txt') == b'original x'
+
+
+def test_sync_skips_untouched_destinations(tmp_path):
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    _write(str(src / 'a.txt'), b'a')
+    _write(str(src / 'b' / 'c.txt'), b'c')
+
+    _sync(src, dst)
+    summary = _sync(src, dst)
+    assert summary['skipped'] == 2
+
+
+def test_sync_move_removes_source_when_destination_is_identical(tmp_path):
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    _write(str(src / 'a.txt'), b'same')
+    _write(str(src / 'b.txt'), b'new')
+    # 模拟上次移动在复制之后、删除源文件之前中断：目标中已有相同的副本
+    _write(str(dst / 'a.txt'), b'same')
+    os.utime(src / 'a.txt', (1000000000, 1000000000))
+    os.utime(dst / 'a.txt', (1000000000, 1000000000))
+
+    summary = _sync(src, dst, is_move=True)
+    assert summary['files'] == 2 and summary['skipped'] == 0
+    assert not os.path.exists(src / 'a.txt') and not os.path.exists(src / 'b.txt')
+    assert _read(dst / 'a.txt') == b'same'
+    assert _read(dst / 'b.txt') == b'new'
+
+
+def test_sync_with_index_sees_in_place_edits(tmp_path):
+    from scan_index import ScanIndex
+
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    _write(str(src / 'top.txt'), b'old')
+    # 目录的修改时间足够早，索引才会信任它（见 scan_index.RACY_WINDOW）
+    os.utime(src, (1000000000, 1000000000))
+    with ScanIndex(str(tmp_path / 'index.db')) as scan_index:
+        process_files(str(src), str(dst), None, None, None, keep_structure=True, log_enabled=False, sync=True,
+                      show_progress=False, quiet=True, show_summary=False, scan_index=scan_index)
+        # 在原处修改内容，并保持所在目录的修改时间不变，使索引直接复用旧的目录列表
+        _write(str(src / 'top.txt'), b'new content')
+        os.utime(src, (1000000000, 1000000000))
+        os.utime(src / 'top.txt', (2000000000, 2000000000))
+        summary = process_files(str(src), str(dst), None, None, None, keep_structure=True, log_enabled=False,
+                                sync=True, show_progress=False, quiet=True, show_summary=False,
+                                scan_index=scan_index)
+    assert summary['files'] == 1 and summary['skipped'] == 0
+    assert _read(dst / 'top.txt') == b'new content'
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+图形界面的后台作业
+扫描、生成计划和复制等耗时操作在后台线程中执行，输出文本、进度和结果通过队列交给界面线程。
+界面线程用 root.after 按固定间隔取出队列中的全部事件并一次性应用，窗口始终保持响应，
+复制过程也不会等待界面绘制。适用于 tkinter 和 customtkinter。
+输出面板只保留最近的若干行，完整记录见目标目录中的操作日志，内存占用和刷新耗时与作业规模无关。
+FileCopierController 是两个界面共用的控制逻辑（扫描、确认、执行、暂停和取消），
+各界面只负责创建控件并实现少量控件相关的方法。
+"""
+import os
+import sys
+import queue
+import threading
+import subprocess
+from collections import namedtuple
+from tkinter import filedialog, messagebox
+from file_copier import analyze_file_types, build_plan, execute_plan, process_files, format_plan_summary, latest_log
+from file_filter import FileFilter, normalize_extensions
+from progress import format_progress
+from profiler import JobProfiler
+from job_control import JobControl
+
+# 界面刷新间隔（毫秒），约 20 帧/秒
+UI_FRAME_INTERVAL = 50
+
+# 输出面板和错误面板最多保留的行数
+OUTPUT_MAX_LINES = 2000
+ERROR_MAX_LINES = 500
+
+# 一次 poll 取出的结果：output 为期间输出的全部文本，errors 为其中写入 stderr 的部分，
+# progress 为最新的进度快照（没有时为 None），finished 表示作业已结束，
+# 此时 result 为返回值，error 为异常（成功时为 None）
+JobUpdate = namedtuple('JobUpdate', ['output', 'errors', 'progress', 'finished', 'result', 'error'])
+
+class _QueueWriter:
+    """代替 sys.stdout/sys.stderr，把写入的文本放入事件队列；kind 区分标准输出和错误输出"""
+
+    def __init__(self, events, kind='output'):
+        self.events = events
+        self.kind = kind
+
+    def write(self, text):
+        if text:
+            self.events.put((self.kind, text))
+        return len(text)
+
+    def flush(self):
+        pass
+
+class BackgroundJob:
+    """在后台线程中运行 target(job)
+
+    target 中的 print 输出（stdout 和 stderr，后者另外单独记录）被转入事件队列；可把 job.progress 作为
+    process_files/execute_plan 的 progress_callback。界面线程通过 poll 或 watch 读取事件。
+    同一时间只应运行一个捕获输出的作业（输出重定向是全局的）。
+    """
+
+    def __init__(self, target, capture_output=True):
+        self.target = target
+        self.capture_output = capture_output
+        self._events = queue.SimpleQueue()
+
+    def progress(self, snapshot):
+        """进度回调（在作业线程中调用）"""
+        self._events.put(('progress', snapshot))
+
+    def start(self):
+        threading.Thread(target=self._run, name='UIJob', daemon=True).start()
+        return self
+
+    def _run(self):
+        original_stdout, original_stderr = sys.stdout, sys.stderr
+        if self.capture_output:
+            sys.stdout = _QueueWriter(self._events)
+            sys.stderr = _QueueWriter(self._events, 'errors')
+        try:
+            result = self.target(self)
+        except Exception as e:
+            self._events.put(('error', e))
+        else:
+            self._events.put(('done', result))
+        finally:
+            if self.capture_output:
+                sys.stdout, sys.stderr = original_stdout, original_stderr
+
+    def poll(self):
+        """取出队列中的全部事件并合并：输出文本拼接为一段，进度只保留最新的快照"""
+        output = []
+        errors = []
+        progress = None
+        finished = False
+        result = error = None
+        while True:
+            try:
+                kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'output':
+                output.append(value)
+            elif kind == 'errors':
+                # 错误同时出现在输出面板中，保持与其他输出的先后顺序
+                output.append(value)
+                errors.append(value)
+            elif kind == 'progress':
+                progress = value
+            else:
+                finished = True
+                if kind == 'error':
+                    error = value
+                else:
+                    result = value
+        return JobUpdate(''.join(output), ''.join(errors), progress, finished, result, error)
+
+def watch(root, job, on_output=None, on_progress=None, on_done=None, on_error=None, on_errors=None):
+    """在界面线程中每隔 UI_FRAME_INTERVAL 毫秒应用一次作业的事件
+
+    每一帧最多调用一次 on_output（参数为这段时间的全部输出）、on_errors（其中的错误输出）
+    和 on_progress（参数为最新快照），作业结束后调用 on_done(result) 或 on_error(exception)。
+    """
+    def tick():
+        update = job.poll()
+        if update.output and on_output:
+            on_output(update.output)
+        if update.errors and on_errors:
+            on_errors(update.errors)
+        if update.progress is not None and on_progress:
+            on_progress(update.progress)
+        if not update.finished:
+            root.after(UI_FRAME_INTERVAL, tick)
+        elif update.error is not None:
+            if on_error:
+                on_error(update.error)
+        elif on_done:
+            on_done(update.result)
+
+    root.after(UI_FRAME_INTERVAL, tick)
+
+def append_limited(widget, text, max_lines):
+    """向文本控件（tk.Text 或 CTkTextbox）末尾追加文本，只保留最近的 max_lines 行并滚动到末尾
+
+    一次追加的文本超过 max_lines 行时只插入最后的部分，每帧的插入和删除量与作业规模无关。
+    """
+    lines = text.splitlines(keepends=True)
+    if len(lines) > max_lines:
+        text = ''.join(lines[-max_lines:])
+    widget.insert('end', text)
+    # 最后一个换行符之后还有一个空行
+    line_count = int(widget.index('end-1c').split('.')[0])
+    if line_count > max_lines + 1:
+        widget.delete('1.0', f'{line_count - max_lines}.0')
+    widget.see('end')
+
+def open_path(path):
+    """用系统默认程序打开文件"""
+    if sys.platform == 'win32':
+        os.startfile(path)
+    elif sys.platform == 'darwin':
+        subprocess.Popen(['open', path])
+    else:
+        subprocess.Popen(['xdg-open', path])
+
+class FileCopierController:
+    """文件复制界面的控制逻辑，与具体的控件库无关
+
+    使用它的界面类需要提供以下属性：root、status_var、error_label_var、output_text、error_text、
+    source_entry、dest_entry、extensions_entry、include_entry、exclude_entry，以及选项变量
+    operation_var、keep_structure_var、log_enabled_var、workers_var、profile_var、preview_var；
+    并实现 set_busy(busy)（启用或禁用扫描和执行按钮）、set_control_buttons(enabled, pause_text)
+    （暂停和取消按钮的状态及暂停按钮的文字）和 set_progress(fraction)。
+    """
+
+    # 正在后台运行的作业，同一时间只运行一个
+    job = None
+    # 正在执行的操作的暂停和取消标记
+    control = None
+    # 错误面板中的错误数
+    error_count = 0
+
+    def browse_source(self):
+        """浏览选择源目录"""
+        directory = filedialog.askdirectory(title="选择源目录")
+        if directory:
+            self.source_entry.delete(0, 'end')
+            self.source_entry.insert(0, directory)
+
+    def browse_dest(self):
+        """浏览选择目标目录"""
+        directory = filedialog.askdirectory(title="选择目标目录")
+        if directory:
+            self.dest_entry.delete(0, 'end')
+            self.dest_entry.insert(0, directory)
+
+    def append_output(self, text):
+        """追加一段输出（每帧最多调用一次），只保留最近的 OUTPUT_MAX_LINES 行"""
+        append_limited(self.output_text, text, OUTPUT_MAX_LINES)
+
+    def append_errors(self, text):
+        """追加错误输出并更新错误数"""
+        self.error_count += text.count('\n')
+        self.error_label_var.set(f"错误信息（{self.error_count} 条）:")
+        append_limited(self.error_text, text, ERROR_MAX_LINES)
+
+    def reset_output(self):
+        """清空输出和错误区域"""
+        self.output_text.delete('1.0', 'end')
+        self.error_text.delete('1.0', 'end')
+        self.error_count = 0
+        self.error_label_var.set("错误信息:")
+
+    def show_log(self):
+        """用系统默认程序打开目标目录中最新的操作日志"""
+        dest_dir = self.dest_entry.get().strip()
+        log_path = latest_log(dest_dir) if dest_dir else None
+        if log_path is None:
+            messagebox.showinfo("提示", "目标目录中还没有操作日志（需要勾选“记录日志”）")
+            return
+        try:
+            open_path(log_path)
+        except OSError as e:
+            messagebox.showerror("错误", f"无法打开日志文件 {log_path}: {str(e)}")
+
+    def toggle_pause(self):
+        """暂停或继续正在执行的操作"""
+        if self.control is None or self.control.cancelled:
+            return
+        if self.control.paused:
+            self.control.resume()
+            self.set_control_buttons(True, "暂停")
+            self.status_var.set("正在继续...")
+        else:
+            self.control.pause()
+            self.set_control_buttons(True, "继续")
+            self.status_var.set("已暂停")
+
+    def cancel_job(self):
+        """取消正在执行的操作：正在复制的文件停在下一个数据块，写了一半的目标文件会被删除"""
+        if self.control is None:
+            return
+        self.control.cancel()
+        self.set_control_buttons(False, "暂停")
+        self.status_var.set("正在取消...")
+
+    def run_job(self, target, on_done, on_error, on_progress=None, control=None):
+        """在后台线程中运行 target(job)，期间禁用扫描和执行按钮；输出和进度按固定帧率刷新
+
+        传入 control 时启用暂停和取消按钮。
+        """
+        self.set_busy(True)
+        self.control = control
+        if control is not None:
+            self.set_control_buttons(True, "暂停")
+
+        def finish(callback):
+            def handler(value):
+                self.job = None
+                self.control = None
+                self.set_busy(False)
+                self.set_control_buttons(False, "暂停")
+                callback(value)
+            return handler
+
+        self.job = BackgroundJob(target).start()
+        watch(self.root, self.job, self.append_output, on_progress, finish(on_done), finish(on_error),
+              on_errors=self.append_errors)
+
+    def scan_source(self):
+        """扫描源目录中的文件类型"""
+        if self.job is not None:
+            return
+        source_dir = self.source_entry.get().strip()
+
+        if not source_dir or not os.path.exists(source_dir):
+            messagebox.showerror("错误", "请选择有效的源目录")
+            return
+
+        # 清空输出区域
+        self.reset_output()
+        self.status_var.set("正在扫描目录...")
+
+        def on_error(e):
+            self.append_output(f"\n扫描过程中发生错误: {str(e)}\n")
+            self.append_errors(f"扫描过程中发生错误: {str(e)}\n")
+            self.status_var.set("发生错误")
+
+        # 在后台线程中扫描，输出由 run_job 转入文本区域
+        self.run_job(lambda job: analyze_file_types(source_dir), lambda result: self.status_var.set("扫描完成"), on_error)
+
+    def execute(self):
+        """执行文件处理操作"""
+        if self.job is not None:
+            return
+        source_dir = self.source_entry.get().strip()
+        dest_dir = self.dest_entry.get().strip()
+
+        # 验证输入
+        if not source_dir or not os.path.exists(source_dir):
+            messagebox.showerror("错误", "请选择有效的源目录")
+            return
+
+        if not dest_dir:
+            messagebox.showerror("错误", "请选择目标目录")
+            return
+
+        # 获取其他参数
+        is_move = self.operation_var.get() == "剪切"
+        keep_structure = self.keep_structure_var.get()
+        log_enabled = self.log_enabled_var.get()
+        try:
+            workers = int(self.workers_var.get().strip())
+        except ValueError:
+            workers = 0
+        if workers < 1:
+            messagebox.showerror("错误", "并发线程数必须是大于等于 1 的整数")
+            return
+
+        # 处理文件后缀
+        extensions_text = self.extensions_entry.get().strip()
+        extensions = []
+        if extensions_text:
+            extensions = normalize_extensions(extensions_text.split())
+
+        # 处理包含/排除关键词
+        include_text = self.include_entry.get().strip()
+        include_keywords = include_text.split() if include_text else None
+
+        exclude_text = self.exclude_entry.get().strip()
+        exclude_keywords = exclude_text.split() if exclude_text else None
+
+        # 编译筛选规则，整个作业只构建一次
+        file_filter = FileFilter(extensions, include_keywords, exclude_keywords)
+
+        op_type = "移动" if is_move else "复制"
+        profile = self.profile_var.get()
+
+        # 确认操作
+        confirm_msg = f"确定要{op_type}文件吗？\n\n"
+        confirm_msg += f"源目录: {source_dir}\n"
+        confirm_msg += f"目标目录: {dest_dir}\n"
+        if extensions:
+            confirm_msg += f"文件后缀: {', '.join(extensions)}\n"
+        if include_keywords:
+            confirm_msg += f"包含关键词: {', '.join(include_keywords)}\n"
+        if exclude_keywords:
+            confirm_msg += f"排除关键词: {', '.join(exclude_keywords)}\n"
+        confirm_msg += f"保留文件夹结构: {'是' if keep_structure else '否'}\n"
+        confirm_msg += f"日志记录: {'启用' if log_enabled else '禁用'}\n"
+        confirm_msg += f"并发线程数: {workers}\n"
+        confirm_msg += f"性能分析: {'启用' if profile else '禁用'}\n"
+
+        if not self.preview_var.get():
+            # 不预览时边扫描边处理，不预先生成计划，内存占用与文件数无关
+            if not messagebox.askyesno("确认操作", confirm_msg):
+                return
+            self.run_operation(op_type, lambda job, control, profiler: process_files(
+                source_dir, dest_dir, extensions, include_keywords, exclude_keywords, is_move, keep_structure,
+                log_enabled, workers=workers, file_filter=file_filter, progress_callback=job.progress,
+                show_progress=False, profiler=profiler, control=control), profile)
+            return
+
+        # 预览：先在后台生成执行计划，确认对话框中显示实际要执行的操作
+        self.status_var.set("正在生成执行计划...")
+
+        def on_plan_error(e):
+            messagebox.showerror("错误", f"生成执行计划时发生错误: {str(e)}")
+            self.status_var.set("发生错误")
+
+        def on_plan(plan):
+            self.status_var.set("就绪")
+            if not plan['operations']:
+                messagebox.showinfo("提示", "没有找到匹配的文件")
+                return
+
+            plan_msg = confirm_msg + f"\n执行计划:\n{format_plan_summary(plan)}\n"
+            if not plan['enough_space']:
+                plan_msg += "\n警告：目标磁盘可用空间不足！\n"
+            if not messagebox.askyesno("确认操作", plan_msg):
+                return
+            self.run_operation(op_type, lambda job, control, profiler: execute_plan(
+                plan, workers, log_enabled=log_enabled, progress_callback=job.progress, profiler=profiler,
+                show_progress=False, control=control), profile)
+
+        self.run_job(lambda job: build_plan(source_dir, dest_dir, extensions, include_keywords, exclude_keywords,
+                                            is_move, keep_structure, workers, file_filter=file_filter),
+                     on_plan, on_plan_error)
+
+    def run_operation(self, op_type, work, profile):
+        """在后台线程中执行复制或移动
+
+        work(job, control, profiler) 在作业线程中调用 process_files 或 execute_plan 并返回其汇总。
+        """
+        # 更新状态
+        self.status_var.set(f"正在{op_type}文件...")
+        self.set_progress(0)
+
+        # 清空输出区域
+        self.reset_output()
+
+        control = JobControl()
+
+        def on_progress(snapshot):
+            """按字节进度更新进度条和状态栏；暂停和取消时保留对应的状态"""
+            self.set_progress(snapshot['fraction'])
+            if not control.paused and not control.cancelled:
+                self.status_var.set(f"正在{op_type}文件: {format_progress(snapshot)}")
+
+        def on_done(summary):
+            if summary is None:
+                messagebox.showinfo("提示", "没有找到匹配的文件")
+                self.status_var.set("就绪")
+                return
+            if summary.get('cancelled'):
+                messagebox.showinfo("已取消", f"文件{op_type}操作已取消，已完成的文件保持不变")
+                self.status_var.set("已取消")
+                return
+            self.set_progress(1.0)
+            messagebox.showinfo("完成", f"文件{op_type}操作已完成")
+            self.status_var.set("操作完成")
+
+        def on_error(e):
+            error_msg = f"操作过程中发生错误: {str(e)}"
+            self.append_output(f"\n{error_msg}\n")
+            self.append_errors(f"{error_msg}\n")
+            messagebox.showerror("错误", error_msg)
+            self.status_var.set("发生错误")
+
+        self.run_job(lambda job: work(job, control, JobProfiler() if profile else None),
+                     on_done, on_error, on_progress, control=control)